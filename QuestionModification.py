@@ -1,28 +1,68 @@
-import json
+import asyncio
+import contextlib
+import functools
 import os
 import logging
-from pathlib import Path
+import re
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
-from typing import Iterable, Optional
-
-from openai import OpenAI
+from typing import Optional
+from openai import AsyncOpenAI, OpenAI
 
 from data_model import ExamQuestion, SubQuestion
+from llm_client import (
+    SEMANTIC_CACHE_EMBEDDING_MODEL,
+    RateLimiter,
+    SemanticCache,
+    acall_with_retry,
+    astream_json,
+    cache_get,
+    cache_key,
+    cache_put,
+    call_with_retry,
+    dumps,
+    get_async_client,
+    get_client,
+    loads,
+    rate_limiter,
+)
 
 logger = logging.getLogger(__name__)
 
 
+# Static instructions live in the system prompt and the per-call data at the end of the
+# user message, so consecutive requests share a cacheable prompt prefix.
 SYSTEM_PROMPT_SUBQUESTION = """
 You generate a new single sub-question based on an old question you get provided.
-Input JSON contains: question_text_latex, question_answer_latex, available_points, variation (0-10).
+The input contains the variation level (0-10), optionally the previous sub-questions of the same exam question, and the original question, answer and available points.
 0 means only adjust numbers while keeping wording and task essentially identical; 10 means a completely new task while keeping the same difficulty and amount of work needed to solve.
 Rewrite according to the variation level and update question_answer_latex accordingly.
+
+Variation guide:
+- 0: Only adjust numbers, keep wording and task identical
+- 5: Moderate changes to wording and approach, same difficulty
+- 10: Completely new task, same difficulty and workload
+
+If previous sub-questions are given, keep the new sub-question consistent with them.
 Respond ONLY with JSON: {"question_text_latex": "...", "question_answer_latex": "..."}.
 """
 
+PROMPT_CACHE_KEY_SUBQUESTION = "examinator-subq-v1"
+PROMPT_CACHE_KEY_ONE_GO = "examinator-one-go-v1"
+
+SYSTEM_PROMPT_SUBQUESTION_BULK = """
+You generate new sub-questions based on old ones you get provided.
+Input JSON contains: variation (0-10) and items[*] with id, question_text_latex, question_answer_latex, available_points.
+0 means only adjust numbers while keeping wording and task essentially identical; 10 means a completely new task while keeping the same difficulty and amount of work needed to solve.
+Rewrite every item independently according to the variation level and update question_answer_latex accordingly.
+Respond ONLY with JSON: {"items": [{"id": 0, "question_text_latex": "...", "question_answer_latex": "..."}, ...]} containing every input id exactly once.
+"""
+
 SYSTEM_PROMPT_ONE_GO = """
 You rewrite an entire ExamQuestion in one step.
-Input JSON contains: total_points, question_title, question_description_latex, sub_questions[*], variation (0-10).
+The input contains the variation level (0-10) and the ExamQuestion JSON with total_points, question_title, question_description_latex and sub_questions[*].
 0 means only adjust numbers while keeping wording and task identical; 10 means a completely different task(nothing to do with the old one use skript context) while keeping the same difficulty and workload.
 Rules:
 - Preserve structure and fields (total_points, question_title, question_description_latex, sub_questions with available_points, etc.).
@@ -31,29 +71,35 @@ Rules:
 - Respond ONLY with valid JSON matching the ExamQuestion schema.
 """
 
+# Request parts that never change, built once instead of per call.
+_SYSTEM_MESSAGE_SUBQUESTION = {"role": "system", "content": SYSTEM_PROMPT_SUBQUESTION}
+_SYSTEM_MESSAGE_SUBQUESTION_BULK = {"role": "system", "content": SYSTEM_PROMPT_SUBQUESTION_BULK}
+_SYSTEM_MESSAGE_ONE_GO = {"role": "system", "content": SYSTEM_PROMPT_ONE_GO}
+_JSON_OBJECT_FORMAT = {"type": "json_object"}
+_EXTRA_BODY_SUBQUESTION = {"prompt_cache_key": PROMPT_CACHE_KEY_SUBQUESTION}
+_EXTRA_BODY_ONE_GO = {"prompt_cache_key": PROMPT_CACHE_KEY_ONE_GO}
 
-def _load_env_files(paths: Iterable[Path]) -> None:
-    """Minimal .env loader to avoid extra dependencies."""
-    for path in paths:
-        if not path.exists():
-            continue
-        for line in path.read_text().splitlines():
-            if not line or line.strip().startswith("#") or "=" not in line:
-                continue
-            key, _, value = line.partition("=")
-            os.environ.setdefault(key.strip(), value.strip())
+_BULK_ITEM_FIELDS = {"question_text_latex", "question_answer_latex", "available_points"}
+_CLIENT_WITHOUT_CHAIN_CONTEXT = (
+    "client is the sync client of the chained rewrite; with chain_context=False pass an "
+    "AsyncOpenAI client to arewrite_exam_question(s) instead"
+)
 
+# Only the most recent rewritten predecessors are sent along, bounding the input tokens.
+MAX_CONTEXT_SUB_QUESTIONS = 4
+# Static scaffolding of the per-sub-question user prompt.
+_CONTEXT_HEADER = "\n\nPrevious sub-questions in this exam question:\n"
+_CONTEXT_ENTRY = "\n{}. {}\n   Answer: {}\n   Points: {}\n"
+_SUB_QUESTION_ENTRY = "\n\nOriginal question: {}\nOriginal answer: {}\nAvailable points: {}"
 
-def _client(api_key: Optional[str] = None) -> OpenAI:
-    cwd = Path.cwd()
-    _load_env_files([cwd / ".env", cwd.parent / ".env"])
+_BATCH_FINAL_STATES = {"completed", "failed", "expired", "cancelled"}
 
-    key = api_key or os.environ.get("OPENAI_API_KEY")
-    if not key:
-        raise RuntimeError(
-            "Set OPENAI_API_KEY (e.g., in a local .env file that is gitignored)."
-        )
-    return OpenAI(api_key=key)
+# Near-duplicate reuse is only attempted for low variation levels, where rewrites stay close
+# to the original wording.
+SEMANTIC_CACHE_MAX_VARIATION = 2
+
+# Sub-questions per request on the concurrent rewrite path; fewer requests count against RPM.
+DEFAULT_BULK_SIZE = 5
 
 
 def _copy_model(obj, update: dict):
@@ -63,6 +109,145 @@ def _copy_model(obj, update: dict):
     return obj.copy(update=update)
 
 
+def _context_entry(index: int, sub_question: SubQuestion, update: dict) -> str:
+    """Format one rewritten predecessor for the context block of later sub-questions."""
+    return _CONTEXT_ENTRY.format(
+        index,
+        update.get("question_text_latex", sub_question.question_text_latex),
+        update.get("question_answer_latex", sub_question.question_answer_latex),
+        sub_question.available_points,
+    )
+
+
+def _distinct_sub_questions(
+    sub_questions: list[SubQuestion],
+) -> tuple[list[SubQuestion], list[int]]:
+    """Return the distinct sub-questions and, for every input, the index of its distinct copy."""
+    first_index: dict[tuple, int] = {}
+    distinct: list[SubQuestion] = []
+    positions: list[int] = []
+    for sub_q in sub_questions:
+        key = (sub_q.question_text_latex, sub_q.question_answer_latex, sub_q.available_points)
+        if key not in first_index:
+            first_index[key] = len(distinct)
+            distinct.append(sub_q)
+        positions.append(first_index[key])
+    return distinct, positions
+
+
+def _with_sub_question_updates(exam_question: ExamQuestion, updates: list[dict]) -> ExamQuestion:
+    """Build the rewritten ExamQuestion in one pass from the per-sub-question field updates."""
+    sub_questions = [
+        _copy_model(sub_q, update=update) if update else sub_q
+        for sub_q, update in zip(exam_question.sub_questions, updates)
+    ]
+    return _copy_model(exam_question, update={"sub_questions": sub_questions})
+
+
+def _sub_question_messages(
+    sub_question: SubQuestion,
+    *,
+    variation: int,
+    context_text: str = "",
+) -> list[dict]:
+    """Build the chat messages for rewriting a single sub-question."""
+    parts = [f"Variation level: {variation}/10"]
+    if context_text:
+        parts.append(_CONTEXT_HEADER)
+        parts.append(context_text)
+    parts.append(
+        _SUB_QUESTION_ENTRY.format(
+            sub_question.question_text_latex,
+            sub_question.question_answer_latex,
+            sub_question.available_points,
+        )
+    )
+    user_prompt = "".join(parts)
+
+    return [
+        _SYSTEM_MESSAGE_SUBQUESTION,
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+def _needs_rewrite(sub_question: SubQuestion, variation: int) -> bool:
+    """
+    Empty or zero-point sub-questions (intro prose, containers), and number-free ones at
+    variation 0, are kept as they are without asking the model.
+    """
+    text = sub_question.question_text_latex.strip()
+    if not text or sub_question.available_points == 0:
+        return False
+    return variation > 0 or re.search(r"\d", text) is not None
+
+
+@functools.lru_cache(maxsize=None)
+def _semantic_cache(model: str, variation: int) -> SemanticCache:
+    return SemanticCache()
+
+
+def _semantic_cache_for(
+    model: str, variation: int, threshold: Optional[float]
+) -> Optional[SemanticCache]:
+    """Return the near-duplicate cache for this model and variation level, if enabled."""
+    if threshold is None or variation > SEMANTIC_CACHE_MAX_VARIATION:
+        return None
+    return _semantic_cache(model, variation)
+
+
+def _cache_usable(
+    cache_enabled: Optional[bool],
+    temperature: float,
+    seed: Optional[int],
+    allow_nondeterministic_cache: bool = False,
+) -> bool:
+    """
+    Cached rewrites are only reproducible for greedy decoding or a fixed sampling seed, so by
+    default (`cache_enabled=None`) the cache is used only then and otherwise skipped silently;
+    an explicit `cache_enabled=True` for a sampled rewrite warns instead.
+    `allow_nondeterministic_cache` replays sampled rewrites anyway (e.g. to reproduce a run).
+    """
+    if cache_enabled is False:
+        return False
+    if temperature > 0 and seed is None and not allow_nondeterministic_cache:
+        if cache_enabled:
+            warnings.warn(
+                "Response cache is skipped for temperature > 0 without a seed.", stacklevel=3
+            )
+        return False
+    return True
+
+
+def _default_bulk_size(
+    cache_enabled: Optional[bool],
+    temperature: float,
+    seed: Optional[int],
+    allow_nondeterministic_cache: bool,
+    semantic_cache_threshold: Optional[float],
+) -> int:
+    """
+    Bulk requests have no per-item response or semantic cache and send no seed, so fall back to
+    one request per sub-question whenever any of those is in effect.
+    """
+    caching = cache_enabled or (
+        cache_enabled is None and (temperature <= 0 or allow_nondeterministic_cache)
+    )
+    if caching or seed is not None or semantic_cache_threshold is not None:
+        return 1
+    return DEFAULT_BULK_SIZE
+
+
+def _parsed_update(response) -> dict:
+    parsed = response.choices[0].message.parsed
+    if not parsed:
+        raise RuntimeError("Failed to parse rewritten sub-question from model response.")
+
+    return {
+        "question_text_latex": parsed.question_text_latex,
+        "question_answer_latex": parsed.question_answer_latex,
+    }
+
+
 def _rewrite_sub_question(
     sub_question: SubQuestion,
     *,
@@ -70,81 +255,541 @@ def _rewrite_sub_question(
     temperature: float,
     client: OpenAI,
     variation: int,
-    context_sub_questions: list[SubQuestion],
-) -> SubQuestion:
-    """Send only minimal sub-question content to the model and return rewritten fields."""
-    context_info = ""
-    if context_sub_questions:
-        context_info = "\n\nPrevious sub-questions in this exam question:\n"
-        for i, cq in enumerate(context_sub_questions, 1):
-            context_info += f"\n{i}. {cq.question_text_latex}"
-            context_info += f"\n   Answer: {cq.question_answer_latex}"
-            context_info += f"\n   Points: {cq.available_points}\n"
-
-    user_prompt = f"""Generate a new sub-question based on the following:
-
-Original question: {sub_question.question_text_latex}
-Original answer: {sub_question.question_answer_latex}
-Available points: {sub_question.available_points}
-Variation level: {variation}/10
+    context_text: str = "",
+    cache_enabled: Optional[bool] = None,
+    allow_nondeterministic_cache: bool = False,
+    seed: Optional[int] = None,
+    limiter: Optional[RateLimiter] = None,
+    semantic_cache_threshold: Optional[float] = None,
+) -> dict:
+    """
+    Send only minimal sub-question content to the model and return the rewritten fields
+    (an empty dict when the sub-question is kept as it is).
+    """
+    if not _needs_rewrite(sub_question, variation):
+        return {}
 
-Variation guide:
-- 0: Only adjust numbers, keep wording and task identical
-- 5: Moderate changes to wording and approach, same difficulty
-- 10: Completely new task, same difficulty and workload{context_info}
+    messages = _sub_question_messages(
+        sub_question, variation=variation, context_text=context_text
+    )
+    key = (
+        cache_key(model, temperature, seed, messages)
+        if _cache_usable(cache_enabled, temperature, seed, allow_nondeterministic_cache)
+        else None
+    )
+    update = cache_get(key) if key else None
+
+    semantic_cache = _semantic_cache_for(model, variation, semantic_cache_threshold)
+    if update is None and semantic_cache is not None:
+        embedding_response = call_with_retry(
+            client.embeddings.create,
+            model=SEMANTIC_CACHE_EMBEDDING_MODEL,
+            input=messages[-1]["content"],
+        )
+        embedding = embedding_response.data[0].embedding
+        update = semantic_cache.lookup(embedding, semantic_cache_threshold)
+        if update is not None:
+            return update
+
+    if update is None:
+        response = call_with_retry(
+            client.beta.chat.completions.parse,
+            limiter=limiter,
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            response_format=SubQuestion,  # Hilfsmodell
+            extra_body=_EXTRA_BODY_SUBQUESTION,
+            **({"seed": seed} if seed is not None else {}),
+        )
+        update = _parsed_update(response)
+        if key:
+            cache_put(key, update)
+        if semantic_cache is not None:
+            semantic_cache.add(embedding, update)
 
-Respond ONLY with JSON: {{"question_text_latex": "...", "question_answer_latex": "..."}}"""
+    return update
 
+
+async def _rewrite_sub_question_async(
+    sub_question: SubQuestion,
+    *,
+    model: str,
+    temperature: float,
+    client: AsyncOpenAI,
+    variation: int,
+    context_text: str = "",
+    cache_enabled: Optional[bool] = None,
+    allow_nondeterministic_cache: bool = False,
+    seed: Optional[int] = None,
+    limiter: Optional[RateLimiter] = None,
+    semantic_cache_threshold: Optional[float] = None,
+) -> dict:
+    """Async counterpart of `_rewrite_sub_question` for concurrent fan-out."""
+    if not _needs_rewrite(sub_question, variation):
+        return {}
+
+    messages = _sub_question_messages(
+        sub_question, variation=variation, context_text=context_text
+    )
+    key = (
+        cache_key(model, temperature, seed, messages)
+        if _cache_usable(cache_enabled, temperature, seed, allow_nondeterministic_cache)
+        else None
+    )
+    update = cache_get(key) if key else None
+
+    semantic_cache = _semantic_cache_for(model, variation, semantic_cache_threshold)
+    if update is None and semantic_cache is not None:
+        embedding_response = await acall_with_retry(
+            client.embeddings.create,
+            model=SEMANTIC_CACHE_EMBEDDING_MODEL,
+            input=messages[-1]["content"],
+        )
+        embedding = embedding_response.data[0].embedding
+        update = semantic_cache.lookup(embedding, semantic_cache_threshold)
+        if update is not None:
+            return update
+
+    if update is None:
+        response = await acall_with_retry(
+            client.beta.chat.completions.parse,
+            limiter=limiter,
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            response_format=SubQuestion,
+            extra_body=_EXTRA_BODY_SUBQUESTION,
+            **({"seed": seed} if seed is not None else {}),
+        )
+        update = _parsed_update(response)
+        if key:
+            cache_put(key, update)
+        if semantic_cache is not None:
+            semantic_cache.add(embedding, update)
+
+    return update
+
+
+async def _rewrite_sub_questions_bulk(
+    sub_questions: list[SubQuestion],
+    *,
+    model: str,
+    temperature: float,
+    client: AsyncOpenAI,
+    variation: int,
+    limiter: Optional[RateLimiter] = None,
+) -> list[dict]:
+    """Rewrite several sub-questions with a single request and map the updates back by id."""
+    pending = [i for i, sub_q in enumerate(sub_questions) if _needs_rewrite(sub_q, variation)]
+    if not pending:
+        return [{} for _ in sub_questions]
+
+    payload = {
+        "variation": variation,
+        "items": [
+            {"id": i, **sub_questions[i].model_dump(include=_BULK_ITEM_FIELDS, mode="json")}
+            for i in pending
+        ],
+    }
     messages = [
-        {"role": "system", "content": SYSTEM_PROMPT_SUBQUESTION},
-        {"role": "user", "content": user_prompt},
+        _SYSTEM_MESSAGE_SUBQUESTION_BULK,
+        {"role": "user", "content": dumps(payload)},
     ]
 
-    response = client.beta.chat.completions.parse(
-        model="gpt-4o",
+    content = await astream_json(
+        client.chat.completions.create,
+        limiter=limiter,
+        model=model,
         messages=messages,
         temperature=temperature,
-        response_format=SubQuestion,  # Hilfsmodell
+        response_format=_JSON_OBJECT_FORMAT,
+        extra_body=_EXTRA_BODY_SUBQUESTION,
     )
+    # The model may return ids as strings or drop and mangle items; as in collect_rewrite_batch,
+    # a sub-question without a usable item keeps its original text
+    updates: dict[int, dict] = {}
+    items = content.get("items")
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        try:
+            item_id = int(item.get("id"))
+        except (TypeError, ValueError):
+            continue
+        text = item.get("question_text_latex")
+        answer = item.get("question_answer_latex")
+        if text and answer is not None:
+            updates[item_id] = {"question_text_latex": text, "question_answer_latex": answer}
+    missing = [i for i in pending if i not in updates]
+    if missing:
+        logger.warning(f"No usable rewrite for sub-questions {missing} in the bulk response, keeping them")
 
-    parsed = response.choices[0].message.parsed
-    if not parsed:
-        raise RuntimeError("Failed to parse rewritten sub-question from model response.")
+    return [updates.get(i, {}) if i in pending else {} for i in range(len(sub_questions))]
 
-    update_payload = {
-        "question_text_latex": parsed.question_text_latex,
-        "question_answer_latex": parsed.question_answer_latex,
-    }
-    return _copy_model(sub_question, update=update_payload)
 
-@st.cache_data()
-def rewrite_exam_question(
+async def arewrite_exam_question(
     exam_question: ExamQuestion,
     *,
     model: str = "gpt-4o",
     temperature: float = 0.7,
     variation: int = 5,
-    client: Optional[OpenAI] = None,
+    client: Optional[AsyncOpenAI] = None,
+    bulk_size: Optional[int] = None,
+    cache_enabled: Optional[bool] = None,
+    allow_nondeterministic_cache: bool = False,
+    seed: Optional[int] = None,
+    max_requests_per_minute: Optional[int] = None,
+    max_tokens_per_minute: Optional[int] = None,
+    semantic_cache_threshold: Optional[float] = None,
 ) -> ExamQuestion:
-    """Rewrite a single ExamQuestion instance and return the rewritten instance."""
-    client = client or _client()
-    variation = max(0, min(variation, 10))
+    """
+    Rewrite all sub-questions of an ExamQuestion concurrently.
+    Sub-questions are rewritten independently, so no rewritten predecessors are used as context.
+    Up to `bulk_size` sub-questions share a single request; `bulk_size=1` sends one request per
+    sub-question, which is also the path that uses the response caches and `seed`. By default
+    it is 1 whenever caching, a seed or the semantic cache is in effect and DEFAULT_BULK_SIZE
+    otherwise.
+    The optional per-minute limits are shared by every call configured with the same values.
+    With `semantic_cache_threshold` (e.g. 0.92) and variation <= 2, a sub-question whose prompt
+    embedding is at least that similar to an earlier one reuses the earlier rewrite.
+    """
+    async with contextlib.AsyncExitStack() as stack:
+        if client is None:
+            # A client created here is closed again so its connections do not outlive the loop.
+            client = await stack.enter_async_context(get_async_client())
+
+        variation = max(0, min(variation, 10))
+        limiter = rate_limiter(max_requests_per_minute, max_tokens_per_minute)
+        if bulk_size is None:
+            bulk_size = _default_bulk_size(
+                cache_enabled, temperature, seed, allow_nondeterministic_cache, semantic_cache_threshold
+            )
 
-    rewritten_sub_questions: list[SubQuestion] = []
-    for sub_q in exam_question.sub_questions:
-        rewritten_sub_questions.append(
-            _rewrite_sub_question(
-                sub_q,
+        # Identical sub-questions are rewritten once and the result is shared between them.
+        sub_questions, positions = _distinct_sub_questions(exam_question.sub_questions)
+
+        if bulk_size > 1:
+            chunks = await asyncio.gather(
+                *(
+                    _rewrite_sub_questions_bulk(
+                        sub_questions[start:start + bulk_size],
+                        model=model,
+                        temperature=temperature,
+                        client=client,
+                        variation=variation,
+                        limiter=limiter,
+                    )
+                    for start in range(0, len(sub_questions), bulk_size)
+                )
+            )
+            distinct_updates = [update for chunk in chunks for update in chunk]
+        else:
+            distinct_updates = await asyncio.gather(
+                *(
+                    _rewrite_sub_question_async(
+                        sub_q,
+                        model=model,
+                        temperature=temperature,
+                        client=client,
+                        variation=variation,
+                        cache_enabled=cache_enabled,
+                        allow_nondeterministic_cache=allow_nondeterministic_cache,
+                        seed=seed,
+                        limiter=limiter,
+                        semantic_cache_threshold=semantic_cache_threshold,
+                    )
+                    for sub_q in sub_questions
+                )
+            )
+
+        return _with_sub_question_updates(
+            exam_question, [distinct_updates[i] for i in positions]
+        )
+
+
+async def arewrite_exam_questions(
+    exam_questions: list[ExamQuestion],
+    *,
+    max_concurrency: int = 16,
+    client: Optional[AsyncOpenAI] = None,
+    **kwargs,
+) -> list[ExamQuestion]:
+    """
+    Rewrite several ExamQuestions concurrently on one event loop and one shared client.
+    At most `max_concurrency` questions are in flight at once; each of them fans out over its
+    sub-questions in turn. kwargs are forwarded to `arewrite_exam_question`.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async with contextlib.AsyncExitStack() as stack:
+        if client is None:
+            client = await stack.enter_async_context(get_async_client())
+
+        async def guarded(exam_question: ExamQuestion) -> ExamQuestion:
+            async with semaphore:
+                return await arewrite_exam_question(exam_question, client=client, **kwargs)
+
+        return list(await asyncio.gather(*(guarded(eq) for eq in exam_questions)))
+
+
+def _rewrite_exam_question(
+    exam_question: ExamQuestion,
+    *,
+    model: str = "gpt-4o",
+    temperature: float = 0.7,
+    variation: int = 5,
+    client: Optional[OpenAI] = None,
+    chain_context: bool = True,
+    bulk_size: Optional[int] = None,
+    cache_enabled: Optional[bool] = None,
+    allow_nondeterministic_cache: bool = False,
+    seed: Optional[int] = None,
+    max_requests_per_minute: Optional[int] = None,
+    max_tokens_per_minute: Optional[int] = None,
+    semantic_cache_threshold: Optional[float] = None,
+) -> ExamQuestion:
+    """
+    Rewrite a single ExamQuestion instance and return the rewritten instance.
+
+    With `chain_context` the sub-questions are rewritten one after another so each call sees
+    its already rewritten predecessors; without it all sub-questions are rewritten concurrently,
+    `bulk_size` of them per request. That concurrent path runs on its own event loop with its
+    own async client (async clients are bound to the loop that created them), so passing the
+    sync `client` together with `chain_context=False` raises TypeError; use
+    `arewrite_exam_question` to supply an AsyncOpenAI client.
+    """
+    if not chain_context:
+        if client is not None:
+            raise TypeError(_CLIENT_WITHOUT_CHAIN_CONTEXT)
+        return asyncio.run(
+            arewrite_exam_question(
+                exam_question,
                 model=model,
                 temperature=temperature,
-                client=client,
                 variation=variation,
-                # Use already rewritten predecessors as context to keep the block coherent.
-                context_sub_questions=rewritten_sub_questions,
+                bulk_size=bulk_size,
+                cache_enabled=cache_enabled,
+                allow_nondeterministic_cache=allow_nondeterministic_cache,
+                seed=seed,
+                max_requests_per_minute=max_requests_per_minute,
+                max_tokens_per_minute=max_tokens_per_minute,
+                semantic_cache_threshold=semantic_cache_threshold,
             )
         )
 
-    return _copy_model(exam_question, update={"sub_questions": rewritten_sub_questions})
+    client = client or get_client()
+    variation = max(0, min(variation, 10))
+    limiter = rate_limiter(max_requests_per_minute, max_tokens_per_minute)
+
+    updates: list[dict] = []
+    context_entries: list[str] = []
+    for sub_q in exam_question.sub_questions:
+        update = _rewrite_sub_question(
+            sub_q,
+            model=model,
+            temperature=temperature,
+            client=client,
+            variation=variation,
+            # Use the latest rewritten predecessors as context to keep the block coherent.
+            context_text="".join(context_entries[-MAX_CONTEXT_SUB_QUESTIONS:]),
+            cache_enabled=cache_enabled,
+            allow_nondeterministic_cache=allow_nondeterministic_cache,
+            seed=seed,
+            limiter=limiter,
+            semantic_cache_threshold=semantic_cache_threshold,
+        )
+        updates.append(update)
+        context_entries.append(_context_entry(len(context_entries) + 1, sub_q, update))
+
+    return _with_sub_question_updates(exam_question, updates)
+
+
+@st.cache_data()
+def rewrite_exam_question(exam_question: ExamQuestion, **kwargs) -> ExamQuestion:
+    """Memoized entry point for Streamlit reruns; see `_rewrite_exam_question` for the options."""
+    return _rewrite_exam_question(exam_question, **kwargs)
+
+
+def rewrite_exam_questions(
+    exam_questions: list[ExamQuestion],
+    *,
+    max_parallel_requests: Optional[int] = None,
+    **kwargs,
+) -> list[ExamQuestion]:
+    """
+    Rewrite several ExamQuestions in parallel, one worker thread per question.
+    Results are returned in input order; kwargs are forwarded to `_rewrite_exam_question`.
+    The workers call the uncached core directly so the models are not pickled and hashed
+    by `st.cache_data` on the way in and out of every thread.
+    With `chain_context=False` no thread pool is needed: all questions run on one event loop
+    via `arewrite_exam_questions`, which opens its own async client; a sync `client` cannot be
+    used there and raises TypeError (call `arewrite_exam_questions` with an AsyncOpenAI client).
+    """
+    if not kwargs.get("chain_context", True):
+        if kwargs.get("client") is not None:
+            raise TypeError(_CLIENT_WITHOUT_CHAIN_CONTEXT)
+        if not exam_questions:
+            return []
+        kwargs = {k: v for k, v in kwargs.items() if k not in ("chain_context", "client")}
+        return asyncio.run(
+            arewrite_exam_questions(
+                exam_questions, max_concurrency=max_parallel_requests or 16, **kwargs
+            )
+        )
+    if not exam_questions:
+        return []
+    if max_parallel_requests is None:
+        max_parallel_requests = min(32, (os.cpu_count() or 1) * 5)
+
+    with ThreadPoolExecutor(max_workers=max_parallel_requests) as executor:
+        # Submit everything before collecting so the requests actually overlap.
+        futures = [
+            executor.submit(_rewrite_exam_question, exam_question, **kwargs)
+            for exam_question in exam_questions
+        ]
+        return [future.result() for future in futures]
+
+
+@st.cache_data()
+def rewrite_exam_questions_cached(exam_questions: list[ExamQuestion], **kwargs) -> list[ExamQuestion]:
+    """
+    Memoized entry point for Streamlit reruns: the whole batch is cached on the questions'
+    content, hashed once here rather than per question in the worker threads.
+    """
+    return rewrite_exam_questions(exam_questions, **kwargs)
+
+
+def submit_rewrite_batch(
+    exam_questions: list[ExamQuestion],
+    *,
+    model: str = "gpt-4o",
+    temperature: float = 0.7,
+    variation: int = 5,
+    client: Optional[OpenAI] = None,
+) -> Optional[str]:
+    """
+    Submit one Batch API request per sub-question and return the batch id, or None when no
+    sub-question needs rewriting. Collect the results later with `collect_rewrite_batch`.
+    """
+    client = client or get_client()
+    variation = max(0, min(variation, 10))
+
+    lines = []
+    for q_idx, exam_question in enumerate(exam_questions):
+        for sq_idx, sub_q in enumerate(exam_question.sub_questions):
+            if not _needs_rewrite(sub_q, variation):
+                continue
+            body = {
+                "model": model,
+                "messages": _sub_question_messages(sub_q, variation=variation),
+                "temperature": temperature,
+                "response_format": _JSON_OBJECT_FORMAT,
+                "prompt_cache_key": PROMPT_CACHE_KEY_SUBQUESTION,
+            }
+            lines.append(dumps({
+                "custom_id": f"{q_idx}:{sq_idx}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": body,
+            }))
+    if not lines:
+        return None
+
+    batch_file = client.files.create(
+        file=("rewrite_batch.jsonl", "\n".join(lines).encode("utf-8")),
+        purpose="batch",
+    )
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+    logger.info(f"Submitted rewrite batch {batch.id} with {len(lines)} requests")
+    return batch.id
+
+
+def collect_rewrite_batch(
+    batch_id: str,
+    exam_questions: list[ExamQuestion],
+    *,
+    client: Optional[OpenAI] = None,
+    poll_interval: float = 30.0,
+) -> list[ExamQuestion]:
+    """
+    Wait for a batch from `submit_rewrite_batch` and apply its results to the same
+    `exam_questions`. Sub-questions without a successful result keep their original text.
+    """
+    client = client or get_client()
+
+    batch = client.batches.retrieve(batch_id)
+    while batch.status not in _BATCH_FINAL_STATES:
+        time.sleep(poll_interval)
+        batch = client.batches.retrieve(batch_id)
+    if batch.status != "completed" or not batch.output_file_id:
+        raise RuntimeError(f"Rewrite batch {batch_id} ended with status '{batch.status}'.")
+
+    updates: dict[str, dict] = {}
+    for line in client.files.content(batch.output_file_id).text.splitlines():
+        if not line.strip():
+            continue
+        record = loads(line)
+        response = record.get("response") or {}
+        if record.get("error") or response.get("status_code") != 200:
+            logger.warning(f"Batch request {record.get('custom_id')} failed: {record.get('error')}")
+            continue
+        try:
+            content = loads(response["body"]["choices"][0]["message"]["content"])
+        except ValueError:
+            content = None
+        text = content.get("question_text_latex") if isinstance(content, dict) else None
+        answer = content.get("question_answer_latex") if isinstance(content, dict) else None
+        if not text or answer is None:
+            # Keep the original sub-question rather than failing the whole batch
+            logger.warning(
+                f"Batch request {record.get('custom_id')} returned an unusable rewrite: {content!r}"
+            )
+            continue
+        updates[record["custom_id"]] = {
+            "question_text_latex": text,
+            "question_answer_latex": answer,
+        }
+
+    return [
+        _with_sub_question_updates(
+            exam_question,
+            [
+                updates.get(f"{q_idx}:{sq_idx}", {})
+                for sq_idx in range(len(exam_question.sub_questions))
+            ],
+        )
+        for q_idx, exam_question in enumerate(exam_questions)
+    ]
+
+
+def rewrite_exam_questions_batch(
+    exam_questions: list[ExamQuestion],
+    *,
+    model: str = "gpt-4o",
+    temperature: float = 0.7,
+    variation: int = 5,
+    client: Optional[OpenAI] = None,
+    poll_interval: float = 30.0,
+) -> list[ExamQuestion]:
+    """
+    Rewrite ExamQuestions offline through the OpenAI Batch API (cheaper, up to 24h turnaround).
+    Blocks until the batch is done; use `submit_rewrite_batch` / `collect_rewrite_batch` to
+    submit now and collect in a later run.
+    """
+    client = client or get_client()
+    batch_id = submit_rewrite_batch(
+        exam_questions, model=model, temperature=temperature, variation=variation, client=client
+    )
+    if batch_id is None:
+        return list(exam_questions)
+    return collect_rewrite_batch(
+        batch_id, exam_questions, client=client, poll_interval=poll_interval
+    )
 
 
 def rewrite_exam_question_one_go(
@@ -155,17 +800,16 @@ def rewrite_exam_question_one_go(
     variation: int = 5,
     client: Optional[OpenAI] = None,
     use_script_context: bool = False,
+    max_requests_per_minute: Optional[int] = None,
+    max_tokens_per_minute: Optional[int] = None,
 ) -> ExamQuestion:
     """
     Rewrite a full ExamQuestion in a single LLM call (no per-subquestion iteration).
     Preserves structure via the Pydantic model and returns a new ExamQuestion.
     """
-    client = client or _client()
+    client = client or get_client()
     variation = max(0, min(variation, 10))
 
-    payload = exam_question.model_dump()
-    payload["variation"] = variation
-
     context_section = ""
     if use_script_context:
         try:
@@ -179,20 +823,31 @@ def rewrite_exam_question_one_go(
             context_text = retrieve_context(first_text, top_k=3)
             if context_text:
                 logger.info("Retrieved context from lecture script")
-                context_section = f"\n\nRELEVANT COURSE MATERIAL:\n{context_text}\n"
+                context_section = f"RELEVANT COURSE MATERIAL:\n{context_text}\n\n"
         except Exception as e:
             logger.warning(f"Could not retrieve context: {e}")
 
+    # Keep the system prompt static; course material varies per question, so it goes to the user turn.
     messages = [
-        {"role": "system", "content": SYSTEM_PROMPT_ONE_GO + context_section},
-        {"role": "user", "content": json.dumps(payload, ensure_ascii=True)},
+        _SYSTEM_MESSAGE_ONE_GO,
+        {
+            "role": "user",
+            # model_dump_json serialises in one pass without an intermediate dict.
+            "content": (
+                f"{context_section}Variation level: {variation}/10\n\n"
+                f"{exam_question.model_dump_json()}"
+            ),
+        },
     ]
 
-    response = client.beta.chat.completions.parse(
+    response = call_with_retry(
+        client.beta.chat.completions.parse,
+        limiter=rate_limiter(max_requests_per_minute, max_tokens_per_minute),
         model=model,
         messages=messages,
         temperature=temperature,
         response_format=ExamQuestion,
+        extra_body=_EXTRA_BODY_ONE_GO,
     )
 
     parsed = response.choices[0].message.parsed
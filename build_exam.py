@@ -1,13 +1,14 @@
 
 
 
-from QuestionModification import rewrite_exam_question
-from build_new_mp_questions import modify_mp_questions
+from QuestionModification import rewrite_exam_questions_cached
+from build_new_mp_questions import modify_mp_questions_batch
 from data_model import Exam, MultipleChoiceExamQuestion, SubQuestion
 from ensemble_solver import EnsembleCoordinator, solve_helper
 from render_mc_problem import render_mc_problem, strip_non_ascii
 from render_problem import render_problem
 from jinja2 import Environment, FileSystemLoader
+import logging
 import os
 import sys
 import tempfile
@@ -15,6 +16,8 @@ import shutil
 import subprocess
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 
 def render_exam_tex(problem_filenames: list, template_path: str = "templates/exam_template.jinja2") -> str:
     """
@@ -116,13 +119,16 @@ def override_examconf(exam: Exam, exam_config_path: str):
         f.write(examconf_content)
 
 
-def build_exam(exam: Exam, status_callback=None) -> tuple[str, str]:
+def build_exam(exam: Exam, status_callback=None) -> tuple[bytes, bytes]:
     """
-    Build exam LaTeX files.
+    Build exam LaTeX files and compile them.
     
     Args:
         exam: Exam object to build
         status_callback: Optional callback function(status_message, progress) for UI updates
+        
+    Returns:
+        Tuple of (exam PDF bytes, solution PDF bytes); the build directory is removed
     """
     if status_callback:
         status_callback("Setting up workspace...", 0.1)
@@ -147,6 +153,25 @@ def build_exam(exam: Exam, status_callback=None) -> tuple[str, str]:
     problem_filenames = []
     total_problems = len(exam.exam_content.problems)
 
+    # Rewrite all open questions up front so their LLM calls run in parallel
+    open_indices = [
+        idx for idx, problem in enumerate(exam.exam_content.problems, start=1)
+        if not isinstance(problem, MultipleChoiceExamQuestion)
+    ]
+    rewritten_problems = dict(zip(
+        open_indices,
+        rewrite_exam_questions_cached([exam.exam_content.problems[idx - 1] for idx in open_indices]),
+    ))
+    # Likewise vary all multiple-choice questions concurrently
+    mc_indices = [
+        idx for idx, problem in enumerate(exam.exam_content.problems, start=1)
+        if isinstance(problem, MultipleChoiceExamQuestion)
+    ]
+    rewritten_problems.update(zip(
+        mc_indices,
+        modify_mp_questions_batch([exam.exam_content.problems[idx - 1] for idx in mc_indices]),
+    ))
+
     for idx, problem in enumerate(exam.exam_content.problems, start=1):
         if status_callback:
             progress = 0.3 + (idx / total_problems) * 0.4
@@ -157,16 +182,18 @@ def build_exam(exam: Exam, status_callback=None) -> tuple[str, str]:
         
         # Render the problem using the Jinja template
         if isinstance(problem, MultipleChoiceExamQuestion):
-            new_problem = modify_mp_questions(problem)
+            new_problem = rewritten_problems[idx]
             problem_latex = render_mc_problem(new_problem, problem_number=idx)
         else:
-            new_problem = rewrite_exam_question(problem)
+            new_problem = rewritten_problems[idx]
             q_description = new_problem.question_description_latex if new_problem.question_description_latex else ""
-            for sub_question in new_problem.sub_questions:
+            for sq_idx, sub_question in enumerate(new_problem.sub_questions):
                 if isinstance(sub_question, SubQuestion):
-                    print("Solving sub-question")
+                    logger.debug("Solving sub-question")
                     solution = solve_helper(q_description, sub_question)
-                    sub_question.question_answer_latex = solution['final_answer']
+                    new_problem.sub_questions[sq_idx] = sub_question.model_copy(
+                        update={"question_answer_latex": solution['final_answer']}
+                    )
             problem_latex = render_problem(new_problem, problem_number=idx)
         
         if not problem_latex is None:
@@ -223,8 +250,15 @@ def build_exam(exam: Exam, status_callback=None) -> tuple[str, str]:
         raise FileNotFoundError(f"PDF not found at {pdf_path}")
     if not os.path.exists(solution_pdf_path):
         raise FileNotFoundError(f"Solution PDF not found at {solution_pdf_path}")
+    
+    # Read each PDF once and drop the build directory instead of keeping files around
+    with open(pdf_path, 'rb') as f:
+        pdf_bytes = f.read()
+    with open(solution_pdf_path, 'rb') as f:
+        solution_pdf_bytes = f.read()
+    shutil.rmtree(tmp_dir, ignore_errors=True)
         
-    return pdf_path, solution_pdf_path
+    return pdf_bytes, solution_pdf_bytes
     
     # ============================================================================
     # END OF COMMENTED LaTeX COMPILATION CODE
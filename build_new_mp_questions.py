@@ -1,77 +1,115 @@
-import os
+import asyncio
+import contextlib
+import functools
+import hashlib
 import logging
-from openai import OpenAI
+import time
+from typing import Optional
+from openai import AsyncOpenAI, OpenAI
 from data_model import MultipleChoiceExamQuestion
+from llm_client import (
+    SEMANTIC_CACHE_EMBEDDING_MODEL,
+    RateLimiter,
+    SemanticCache,
+    acall_with_retry,
+    astream_json,
+    call_with_retry,
+    dumps,
+    get_async_client,
+    get_client,
+    loads,
+    rate_limiter,
+)
 import streamlit as st
 
+try:  # the SDK's strict-mode schema conversion, the one beta.chat.completions.parse() applies
+    from openai.lib._pydantic import to_strict_json_schema
+except ImportError:
+    to_strict_json_schema = None
+
 logger = logging.getLogger(__name__)
 
-def generate_exam_question_with_openai(
-    original_question: MultipleChoiceExamQuestion,
-    variation_instruction: str = "Generate a similar question with different numbers and context",
-    variation: int = 5,
-    temperature: float = 0.7,
-    use_script_context: bool = False,
-) -> MultipleChoiceExamQuestion:
+DEFAULT_VARIATION_INSTRUCTION = "Generate a similar question with different numbers and context"
 
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    import json
-    original_json = json.dumps(original_question.model_dump(), indent=2)
-    
-    # Retrieve context from RAG if enabled
-    context_section = ""
-    if use_script_context:
-        try:
-            from ragpipeline import retrieve_context
-            question_text = original_question.sub_questions[0].question_text_latex if original_question.sub_questions else ""
-            context_text = retrieve_context(question_text, top_k=3)
-            if context_text:
-                logger.info(f"Retrieved context from lecture script")
-                context_section = f"\n\nRELEVANT COURSE MATERIAL:\n{context_text}\n"
-        except Exception as e:
-            logger.warning(f"Could not retrieve context: {e}")
+# Structured-output format derived from the pydantic model once at import; parse() would
+# rebuild it on every request. Batch request bodies use the same dict.
+_MC_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": (
+        {
+            "name": "MultipleChoiceExamQuestion",
+            "schema": to_strict_json_schema(MultipleChoiceExamQuestion),
+            "strict": True,
+        }
+        if to_strict_json_schema is not None
+        else {
+            "name": "MultipleChoiceExamQuestion",
+            "schema": MultipleChoiceExamQuestion.model_json_schema(),
+        }
+    ),
+}
+_BATCH_FINAL_STATES = {"completed", "failed", "expired", "cancelled"}
 
+# Hedged requests (opt-in via hedge_after): gpt-5 occasionally takes 30 s on a call that usually
+# returns in a few, so if nothing has come back after HEDGE_AFTER_SECONDS (roughly its P95) the
+# next model in the list is started alongside and the first response wins. The last copy goes to
+# the smaller model. Every copy is billed, so hedging stays off unless a caller asks for it.
+HEDGE_AFTER_SECONDS = 8.0
+_HEDGE_MODELS = ("gpt-5", "gpt-5", "gpt-4o-mini")
+
+# Static prompt prefix, byte-identical across calls so OpenAI's prompt caching can reuse it;
+# only the original question, the variation settings and any course material vary.
+PROMPT_CACHE_KEY_MC = "examinator-mc-v1"
+_EXTRA_BODY_MC = {"prompt_cache_key": PROMPT_CACHE_KEY_MC}
+_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": (
+        "You are an expert exam question generator.\n"
+        "Your ONLY task is to output valid JSON that matches the provided schema.\n"
+        "RULES:\n"
+        "1. Output ONLY JSON. No prose, no explanations.\n"
+        "2. The JSON must match the exact Pydantic schema of MultipleChoiceExamQuestion.\n"
+        "3. All LaTeX must be inside double-quoted strings and escape backslashes.\n"
+        "4. Never include comments, Markdown, or text outside the JSON.\n"
+        "5. Every sub-question must have the same number of options as in the input.\n"
+        "6. correct_option_indices must be 0-indexed and valid.\n"
+        "7. Always include all required fields, even if empty.\n"
+        "8. Variation level (0-10): 0 = adjust numbers only, keep wording almost identical, 10 completely new question (based on Course Material if provided); "
+        "10 = completely new phrasing/context but same concept and difficulty. Use the provided variation value.\n"
+    ),
+}
+
+
+def _script_context(original_question: MultipleChoiceExamQuestion) -> str:
+    """Retrieve course material for the question from the RAG store ("" if none or on failure)."""
+    try:
+        from ragpipeline import retrieve_context
+        question_text = original_question.sub_questions[0].question_text_latex if original_question.sub_questions else ""
+        context_text = retrieve_context(question_text, top_k=3)
+        if context_text:
+            logger.info(f"Retrieved context from lecture script")
+        return context_text or ""
+    except Exception as e:
+        logger.warning(f"Could not retrieve context: {e}")
+        return ""
+
+
+def _variation_messages(
+    original_question: MultipleChoiceExamQuestion,
+    variation_instruction: str,
+    variation: int,
+    context_text: str = "",
+) -> list[dict]:
+    """Build the chat messages asking for a variation of `original_question`."""
+    # Compact UTF-8 JSON: no indentation and no \uXXXX escapes for LaTeX symbols in the prompt
+    original_json = original_question.model_dump_json()
+    
     messages = [
-        {
-            "role": "system",
-            "content": (
-                "You are an expert exam question generator.\n"
-                "Your ONLY task is to output valid JSON that matches the provided schema.\n"
-                "RULES:\n"
-                "1. Output ONLY JSON. No prose, no explanations.\n"
-                "2. The JSON must match the exact Pydantic schema of MultipleChoiceExamQuestion.\n"
-                + context_section +
-                "3. All LaTeX must be inside double-quoted strings and escape backslashes.\n"
-                "4. Never include comments, Markdown, or text outside the JSON.\n"
-                "5. Every sub-question must have the same number of options as in the input.\n"
-                "6. correct_option_indices must be 0-indexed and valid.\n"
-                "7. Always include all required fields, even if empty.\n"
-                "8. Variation level (0-10): 0 = adjust numbers only, keep wording almost identical, 10 completely new question (based on Course Material if provided); "
-                "10 = completely new phrasing/context but same concept and difficulty. Use the provided variation value.\n"
-            )
-        },
+        _SYSTEM_MESSAGE,
         {
             "role": "user",
             "content": (
-                "Here is an example of a valid JSON structure:\n"
-                "{\n"
-                '  "total_points": 10,\n'
-                '  "sub_questions": [\n'
-                "    {\n"
-                '      "question_text_latex": "What is 2+2?",\n'
-                '      "question_options": ["1", "4", "5"],\n'
-                '      "question_correct_option_indices": [1],\n'
-                '      "question_points": 10,\n'
-                '      "calculation_function": "binary_mc",\n'
-                '      "show_mc_notes": false,\n'
-                '      "show_corrections": false,\n'
-                '      "option_corrections": ["", "Correct.", ""]\n'
-                "    }\n"
-                "  ],\n"
-                '  "question_title": "Example",\n'
-                '  "question_description_latex": ""\n'
-                "}\n\n"
-                "Now produce a NEW variation based on the following original question:\n\n"
+                "Produce a NEW variation based on the following original question:\n\n"
                 f"{original_json}\n\n"
                 f"Variation instructions: {variation_instruction}\n"
                 f"Variation level: {max(0, min(variation, 10))}\n\n"
@@ -80,19 +118,375 @@ def generate_exam_question_with_openai(
         }
     ]
 
-    response = client.beta.chat.completions.parse(
+    # Course material goes last so the static prefix above stays cacheable
+    if context_text:
+        messages.append({"role": "user", "content": f"RELEVANT COURSE MATERIAL:\n{context_text}"})
+
+    return messages
+
+
+def _parsed_question(response) -> MultipleChoiceExamQuestion:
+    content = response.choices[0].message.content
+    if not content:
+        raise ValueError("OpenAI API returned no parsed content")
+    return MultipleChoiceExamQuestion.model_validate_json(content)
+
+
+async def _first_completed(calls, hedge_after: Optional[float]):
+    """
+    Await `calls` (zero-argument coroutine functions) as hedged copies of one request: the next
+    one is started whenever `hedge_after` seconds pass without a result. The first successful
+    result is returned and the remaining copies are cancelled; if every copy fails, the last
+    error is raised.
+    """
+    calls = list(calls)
+    pending = {asyncio.create_task(calls.pop(0)())}
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=hedge_after if calls else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+            if calls and (not done or not pending):
+                if not done:
+                    logger.info(f"No response after {hedge_after:.1f}s, sending a hedged request")
+                pending.add(asyncio.create_task(calls.pop(0)()))
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def _question_key(exam_question: MultipleChoiceExamQuestion) -> bytes:
+    """Content hash used to send identical questions of one job to the model only once."""
+    return hashlib.blake2b(exam_question.model_dump_json().encode("utf-8"), digest_size=16).digest()
+
+
+def _has_options(exam_question: MultipleChoiceExamQuestion) -> bool:
+    return any(sub_question.question_options for sub_question in exam_question.sub_questions)
+
+
+@functools.lru_cache(maxsize=None)
+def _semantic_cache(variation: int) -> SemanticCache:
+    """Process-wide near-duplicate cache of variations (stored as JSON) per variation level."""
+    return SemanticCache()
+
+
+def _semantic_cache_for(variation: int, threshold: Optional[float]) -> Optional[SemanticCache]:
+    if threshold is None:
+        return None
+    return _semantic_cache(max(0, min(variation, 10)))
+
+
+def generate_exam_question_with_openai(
+    original_question: MultipleChoiceExamQuestion,
+    variation_instruction: str = DEFAULT_VARIATION_INSTRUCTION,
+    variation: int = 5,
+    temperature: float = 0.7,
+    use_script_context: bool = False,
+    client: Optional[OpenAI] = None,
+    semantic_cache_threshold: Optional[float] = None,
+) -> MultipleChoiceExamQuestion:
+    """
+    Generate a new version of a multiple-choice question. With `semantic_cache_threshold`
+    (e.g. 0.92) the original question is embedded first, and a variation generated earlier in
+    this process for a question at least that similar, at the same variation level, is
+    returned instead of calling the model.
+    """
+    client = client or get_client()
+
+    semantic_cache = _semantic_cache_for(variation, semantic_cache_threshold)
+    if semantic_cache is not None:
+        embedding = call_with_retry(
+            client.embeddings.create,
+            model=SEMANTIC_CACHE_EMBEDDING_MODEL,
+            input=original_question.model_dump_json(),
+        ).data[0].embedding
+        cached = semantic_cache.lookup(embedding, semantic_cache_threshold)
+        if cached is not None:
+            return MultipleChoiceExamQuestion.model_validate_json(cached)
+
+    context_text = _script_context(original_question) if use_script_context else ""
+    messages = _variation_messages(original_question, variation_instruction, variation, context_text)
+
+    response = client.chat.completions.create(
         model="gpt-5",
         messages=messages,
         # temperature=temperature,
-        response_format=MultipleChoiceExamQuestion,
+        response_format=_MC_RESPONSE_FORMAT,
+        extra_body=_EXTRA_BODY_MC,
     )
+    parsed = _parsed_question(response)
+    if semantic_cache is not None:
+        semantic_cache.add(embedding, parsed.model_dump_json())
+    return parsed
 
-    parsed = response.choices[0].message.parsed
-    if parsed is None:
-        raise ValueError("OpenAI API returned no parsed content")
+
+async def agenerate_exam_question_with_openai(
+    original_question: MultipleChoiceExamQuestion,
+    variation_instruction: str = DEFAULT_VARIATION_INSTRUCTION,
+    variation: int = 5,
+    temperature: float = 0.7,
+    use_script_context: bool = False,
+    *,
+    client: AsyncOpenAI,
+    semantic_cache_threshold: Optional[float] = None,
+    limiter: Optional[RateLimiter] = None,
+    hedge_after: Optional[float] = None,
+) -> MultipleChoiceExamQuestion:
+    """
+    Async counterpart of `generate_exam_question_with_openai` on a shared AsyncOpenAI client.
+    With a `limiter` the request waits for request/token budget first; rate-limit and transient
+    errors are retried with backoff. With `hedge_after` (e.g. HEDGE_AFTER_SECONDS) a request still
+    unanswered after that many seconds is hedged with a second copy, and then with one to the
+    fallback model; the default None sends a single request.
+    """
+    semantic_cache = _semantic_cache_for(variation, semantic_cache_threshold)
+    if semantic_cache is not None:
+        embedding_response = await acall_with_retry(
+            client.embeddings.create,
+            model=SEMANTIC_CACHE_EMBEDDING_MODEL,
+            input=original_question.model_dump_json(),
+        )
+        embedding = embedding_response.data[0].embedding
+        cached = semantic_cache.lookup(embedding, semantic_cache_threshold)
+        if cached is not None:
+            return MultipleChoiceExamQuestion.model_validate_json(cached)
+
+    # Retrieval embeds the query and searches the vector store synchronously; run it in a
+    # worker thread so the other in-flight variations keep going
+    context_text = (
+        await asyncio.to_thread(_script_context, original_question) if use_script_context else ""
+    )
+    messages = _variation_messages(original_question, variation_instruction, variation, context_text)
+
+    # Streamed, so the JSON is decoded the moment the object closes rather than after the
+    # response has been fully received and parsed as a whole
+    def call(model: str):
+        async def request():
+            content = await astream_json(
+                client.chat.completions.create,
+                limiter=limiter,
+                model=model,
+                messages=messages,
+                # temperature=temperature,
+                response_format=_MC_RESPONSE_FORMAT,
+                extra_body=_EXTRA_BODY_MC,
+            )
+            return model, content
+
+        return request
+
+    models = _HEDGE_MODELS if hedge_after is not None else _HEDGE_MODELS[:1]
+    model, content = await _first_completed((call(model) for model in models), hedge_after)
+    if model != models[0]:
+        logger.info(f"Using the hedged response from fallback model {model} instead of {models[0]}")
+    parsed = MultipleChoiceExamQuestion.model_validate(content)
+    if semantic_cache is not None:
+        semantic_cache.add(embedding, parsed.model_dump_json())
     return parsed
 
+
+async def amodify_mp_questions(
+    exam_questions: list[MultipleChoiceExamQuestion],
+    *,
+    max_concurrency: int = 16,
+    client: Optional[AsyncOpenAI] = None,
+    use_script_context: bool = False,
+    semantic_cache_threshold: Optional[float] = None,
+    max_requests_per_minute: Optional[int] = None,
+    max_tokens_per_minute: Optional[int] = None,
+    hedge_after: Optional[float] = None,
+) -> list[MultipleChoiceExamQuestion]:
+    """
+    Generate variations of several multiple-choice questions concurrently on one event loop and
+    one shared client, at most `max_concurrency` in flight. Results are in input order; questions
+    without any options are returned unchanged, and identical questions share one variation.
+    With `max_requests_per_minute` / `max_tokens_per_minute` the requests are paced to stay
+    inside the account's quota instead of running into 429s. `hedge_after` is passed on to
+    `agenerate_exam_question_with_openai`.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    limiter = rate_limiter(max_requests_per_minute, max_tokens_per_minute)
+
+    async with contextlib.AsyncExitStack() as stack:
+        if client is None:
+            client = await stack.enter_async_context(get_async_client())
+
+        async def guarded(exam_question: MultipleChoiceExamQuestion) -> MultipleChoiceExamQuestion:
+            if not _has_options(exam_question):
+                return exam_question
+            async with semaphore:
+                return await agenerate_exam_question_with_openai(
+                    exam_question,
+                    use_script_context=use_script_context,
+                    client=client,
+                    semantic_cache_threshold=semantic_cache_threshold,
+                    limiter=limiter,
+                    hedge_after=hedge_after,
+                )
+
+        keys = [_question_key(eq) for eq in exam_questions]
+        distinct = {}
+        for key, exam_question in zip(keys, exam_questions):
+            distinct.setdefault(key, exam_question)
+        variations = dict(zip(distinct, await asyncio.gather(*map(guarded, distinct.values()))))
+        return [variations[key] for key in keys]
+
 @st.cache_data()
 def modify_mp_questions(exam_question: MultipleChoiceExamQuestion, use_script_context: bool = False):
     """Generate new multiple-choice exam questions based on existing ones."""
+    # Nothing to vary without any answer options
+    if not _has_options(exam_question):
+        return exam_question
     return generate_exam_question_with_openai(exam_question, use_script_context=use_script_context)
+
+@st.cache_data()
+def modify_mp_questions_batch(
+    exam_questions: list[MultipleChoiceExamQuestion],
+    use_script_context: bool = False,
+    max_concurrency: int = 16,
+    semantic_cache_threshold: Optional[float] = None,
+    max_requests_per_minute: Optional[int] = None,
+    max_tokens_per_minute: Optional[int] = None,
+    hedge_after: Optional[float] = None,
+) -> list[MultipleChoiceExamQuestion]:
+    """Generate new versions of several multiple-choice questions at once, in input order."""
+    if not exam_questions:
+        return []
+    return asyncio.run(
+        amodify_mp_questions(
+            exam_questions,
+            max_concurrency=max_concurrency,
+            use_script_context=use_script_context,
+            semantic_cache_threshold=semantic_cache_threshold,
+            max_requests_per_minute=max_requests_per_minute,
+            max_tokens_per_minute=max_tokens_per_minute,
+            hedge_after=hedge_after,
+        )
+    )
+
+
+def submit_mp_questions_batch(
+    exam_questions: list[MultipleChoiceExamQuestion],
+    *,
+    use_script_context: bool = False,
+    client: Optional[OpenAI] = None,
+) -> Optional[str]:
+    """
+    Submit one Batch API request per distinct multiple-choice question (half price, separate
+    rate limits, up to 24h turnaround) and return the batch id, or None when no question has
+    options. Collect the results later with `collect_mp_questions_batch`.
+    """
+    client = client or get_client()
+
+    lines = []
+    seen = set()
+    for idx, exam_question in enumerate(exam_questions):
+        key = _question_key(exam_question)
+        # Duplicates are filled in from the first copy's result by collect_mp_questions_batch
+        if not _has_options(exam_question) or key in seen:
+            continue
+        seen.add(key)
+        body = {
+            "model": "gpt-5",
+            "messages": _variation_messages(
+                exam_question,
+                DEFAULT_VARIATION_INSTRUCTION,
+                5,
+                _script_context(exam_question) if use_script_context else "",
+            ),
+            "response_format": _MC_RESPONSE_FORMAT,
+            "prompt_cache_key": PROMPT_CACHE_KEY_MC,
+        }
+        lines.append(dumps({
+            "custom_id": str(idx),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": body,
+        }))
+    if not lines:
+        return None
+
+    batch_file = client.files.create(
+        file=("mp_questions_batch.jsonl", "\n".join(lines).encode("utf-8")),
+        purpose="batch",
+    )
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+    logger.info(f"Submitted multiple-choice batch {batch.id} with {len(lines)} requests")
+    return batch.id
+
+
+def collect_mp_questions_batch(
+    batch_id: str,
+    exam_questions: list[MultipleChoiceExamQuestion],
+    *,
+    client: Optional[OpenAI] = None,
+    poll_interval: float = 30.0,
+) -> list[MultipleChoiceExamQuestion]:
+    """
+    Wait for a batch from `submit_mp_questions_batch` and return the new versions of the same
+    `exam_questions`. Questions without a successful, valid result are returned unchanged.
+    """
+    client = client or get_client()
+
+    batch = client.batches.retrieve(batch_id)
+    while batch.status not in _BATCH_FINAL_STATES:
+        time.sleep(poll_interval)
+        batch = client.batches.retrieve(batch_id)
+    if batch.status != "completed" or not batch.output_file_id:
+        raise RuntimeError(f"Multiple-choice batch {batch_id} ended with status '{batch.status}'.")
+
+    results = list(exam_questions)
+    for line in client.files.content(batch.output_file_id).text.splitlines():
+        if not line.strip():
+            continue
+        record = loads(line)
+        response = record.get("response") or {}
+        if record.get("error") or response.get("status_code") != 200:
+            logger.warning(f"Batch request {record.get('custom_id')} failed: {record.get('error')}")
+            continue
+        content = response["body"]["choices"][0]["message"]["content"]
+        try:
+            results[int(record["custom_id"])] = MultipleChoiceExamQuestion.model_validate_json(content)
+        except ValueError as e:
+            logger.warning(f"Batch request {record['custom_id']} returned an invalid question: {e}")
+
+    keys = [_question_key(eq) for eq in exam_questions]
+    first_index = {}
+    for idx, key in enumerate(keys):
+        first_index.setdefault(key, idx)
+    return [results[first_index[key]] for key in keys]
+
+
+def modify_mp_questions_bulk(
+    exam_questions: list[MultipleChoiceExamQuestion],
+    *,
+    use_script_context: bool = False,
+    client: Optional[OpenAI] = None,
+    poll_interval: float = 30.0,
+) -> list[MultipleChoiceExamQuestion]:
+    """
+    Generate new versions of many multiple-choice questions offline through the Batch API.
+    Blocks until the batch is done; use `submit_mp_questions_batch` /
+    `collect_mp_questions_batch` to submit now and collect in a later run.
+    """
+    client = client or get_client()
+    batch_id = submit_mp_questions_batch(
+        exam_questions, use_script_context=use_script_context, client=client
+    )
+    if batch_id is None:
+        return list(exam_questions)
+    return collect_mp_questions_batch(
+        batch_id, exam_questions, client=client, poll_interval=poll_interval
+    )
@@ -3,12 +3,13 @@ from pydantic import BaseModel, ConfigDict
 
 
 
+# Leaf models are immutable; update them with model_copy(update=...)
 class OptionCorrection(BaseModel):
-    model_config = ConfigDict(extra="forbid")
+    model_config = ConfigDict(extra="forbid", frozen=True)
     pass 
 
 class SubQuestion(BaseModel):
-    model_config = ConfigDict(extra="forbid")  
+    model_config = ConfigDict(extra="forbid", frozen=True)  
     
     question_text_latex: str
     question_answer_latex: str
@@ -17,7 +18,7 @@ class SubQuestion(BaseModel):
     box_height: str = "4cm"
 
 class MultipleChoiceSubQuestion(BaseModel):
-    model_config = ConfigDict(extra="forbid")  
+    model_config = ConfigDict(extra="forbid", frozen=True)  
     
     question_text_latex: str
     question_options: List[str]
@@ -5,21 +5,28 @@ to solve math problems with agreement checking and rephrasing.
 Supports Unified Exam Format (UEF) for structured exam processing.
 """
 
+import asyncio
+import functools
 import os
 import json
 import re
 import time
 import logging
 from collections import Counter
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Tuple, Any, Union
 from pathlib import Path
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from pydantic import ValidationError
 import streamlit as st
+try:
+    import orjson
+except ImportError:  # optional speed-up, stdlib json is used without it
+    orjson = None
 # Import UEF data models
 from data_model import Exam, ExamQuestion, SubQuestion, ExamContent, MultipleChoiceExamQuestion
+from llm_client import RateLimiter, cache_get, cache_key, cache_put, estimate_tokens, get_async_client, get_client, rate_limiter
 
 # Load environment variables
 load_dotenv()
@@ -28,16 +35,48 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Opt-in exact-match cache of solver/arbiter responses, in llm_client's on-disk cache
+LLM_CACHE_ENABLED = os.getenv("EXAMINATOR_LLM_CACHE") == "1"
+
+
+def _response_cache_key(member: str, model: str, messages: List[Dict[str, str]], temperature: float) -> Optional[str]:
+    """
+    Key of a cached response, or None with caching disabled. The three solvers send identical
+    prompts to the same model, so the ensemble member is part of the key; otherwise a cache hit
+    would hand all of them one answer and fake their agreement.
+    """
+    if not LLM_CACHE_ENABLED:
+        return None
+    return cache_key(f"{model}/{member}", temperature, None, messages)
+
+
+def _cached_response(key: Optional[str]) -> Optional[str]:
+    cached = cache_get(key) if key else None
+    return cached["content"] if cached else None
+
+
+def _store_response(key: Optional[str], content: str) -> str:
+    if key:
+        cache_put(key, {"content": content})
+    return content
+
+
+@functools.lru_cache(maxsize=1)
+def _coordinator() -> "EnsembleCoordinator":
+    """One coordinator per process, so every solve_helper call shares its members and pooled client."""
+    return EnsembleCoordinator()
+
+
 @st.cache_data()
 def solve_helper(q_description, sub_question: SubQuestion):
-    solver = EnsembleCoordinator()
+    solver = _coordinator()
     return solver.solve(q_description + "\n" + sub_question.question_text_latex, available_points=sub_question.available_points)
 
 
 class Solver:
     """Independent Solver LLM that attempts to solve math problems."""
     
-    def __init__(self, model: str, name: str, max_retries: int = 3, retry_delay: float = 1.0):
+    def __init__(self, model: str, name: str, max_retries: int = 3, retry_delay: float = 1.0, limiter: Optional[RateLimiter] = None, client: Optional[OpenAI] = None):
         """
         Initialize a Solver instance.
         
@@ -46,15 +85,15 @@ class Solver:
             name: Human-readable name for this solver
             max_retries: Maximum number of retry attempts for API calls
             retry_delay: Initial delay between retries (exponential backoff)
+            limiter: Optional rate limiter shared with the other ensemble members
+            client: OpenAI client to use (defaults to the process-wide pooled client)
         """
-        api_key = os.getenv('OPENAI_API_KEY')
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY not found in environment variables")
-        self.client = OpenAI(api_key=api_key)
+        self.client = client or get_client()
         self.model = model
         self.name = name
         self.max_retries = max_retries
         self.retry_delay = retry_delay
+        self.limiter = limiter
     
     def _call_api_with_retry(self, messages: List[Dict[str, str]], temperature: float = 0.3) -> str:
         """
@@ -70,15 +109,22 @@ class Solver:
         Raises:
             Exception: If all retry attempts fail
         """
+        key = _response_cache_key(self.name, self.model, messages, temperature)
+        cached = _cached_response(key)
+        if cached is not None:
+            return cached
+        
         last_exception = None
         for attempt in range(self.max_retries):
+            if self.limiter:
+                self.limiter.acquire_sync(estimate_tokens(messages))
             try:
                 response = self.client.chat.completions.create(
                     model=self.model,
                     messages=messages,
                     temperature=temperature
                 )
-                return response.choices[0].message.content.strip()
+                return _store_response(key, response.choices[0].message.content.strip())
             except Exception as e:
                 last_exception = e
                 if attempt < self.max_retries - 1:
@@ -90,18 +136,37 @@ class Solver:
         
         raise last_exception or Exception("Unknown error in API call")
     
-    def solve(self, problem: str, is_latex: bool = False, available_points: Optional[float] = None) -> Tuple[str, str]:
-        """
-        Solve a math problem and return answer and explanation.
+    async def _acall_api_with_retry(self, client: AsyncOpenAI, messages: List[Dict[str, str]], temperature: float = 0.3) -> str:
+        """Async counterpart of `_call_api_with_retry` on the given client."""
+        key = _response_cache_key(self.name, self.model, messages, temperature)
+        cached = _cached_response(key)
+        if cached is not None:
+            return cached
         
-        Args:
-            problem: The problem text (can be LaTeX formatted)
-            is_latex: Whether the problem contains LaTeX formatting
-            available_points: Optional points value for the question (used for point distribution)
+        last_exception = None
+        for attempt in range(self.max_retries):
+            if self.limiter:
+                await self.limiter.acquire(estimate_tokens(messages))
+            try:
+                response = await client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=temperature
+                )
+                return _store_response(key, response.choices[0].message.content.strip())
+            except Exception as e:
+                last_exception = e
+                if attempt < self.max_retries - 1:
+                    delay = self.retry_delay * (2 ** attempt)  # Exponential backoff
+                    logger.warning(f"{self.name} attempt {attempt + 1} failed: {e}. Retrying in {delay:.1f}s...")
+                    await asyncio.sleep(delay)
+                else:
+                    logger.error(f"{self.name} failed after {self.max_retries} attempts: {e}")
         
-        Returns:
-            Tuple of (answer, explanation)
-        """
+        raise last_exception or Exception("Unknown error in API call")
+    
+    def _messages(self, problem: str, is_latex: bool, available_points: Optional[float]) -> List[Dict[str, str]]:
+        """Build the chat messages asking for an exam-key style answer to `problem`."""
         latex_note = "\nNote: The problem may contain LaTeX formatting. Interpret it correctly." if is_latex else ""
         
         points_note = ""
@@ -140,43 +205,69 @@ Limit your response to 50 words max.
 Problem:
 {problem}"""
         
-        messages = [
+        return [
             {"role": "system", "content": "You are a math-specialist model creating exam solution keys. Provide concise but complete answers in the style of official exam solutions, with clear explanations and point distributions. Keep answers brief and to the point."},
             {"role": "user", "content": prompt}
         ]
-        
-        try:
-            full_response = self._call_api_with_retry(messages, temperature=0.3)
-            
-            # Extract final answer - look for the pattern "Final Answer: ... (Xp for ...)"
-            # This regex captures everything after "Final Answer:" including the points distribution in parentheses
-            # Pattern: "Final Answer:" followed by text (may include parentheses with points like (1p), (0.5p)) until end or double newline
-            answer_match = re.search(r'Final Answer:\s*(.+?)(?:\n\n|\Z)', full_response, re.IGNORECASE | re.DOTALL)
+    
+    @staticmethod
+    def _extract_answer(full_response: str) -> str:
+        """Pull the "Final Answer: ..." part (with its point distribution) out of a response."""
+        # Extract final answer - look for the pattern "Final Answer: ... (Xp for ...)"
+        # This regex captures everything after "Final Answer:" including the points distribution in parentheses
+        # Pattern: "Final Answer:" followed by text (may include parentheses with points like (1p), (0.5p)) until end or double newline
+        answer_match = re.search(r'Final Answer:\s*(.+?)(?:\n\n|\Z)', full_response, re.IGNORECASE | re.DOTALL)
+        if answer_match:
+            answer = answer_match.group(1).strip()
+            # Ensure we capture the full answer including points distribution in parentheses
+            # Look for patterns like (1p), (0.5p), (2p for ...), etc.
+            # Try to find a complete answer ending with a point distribution
+            if re.search(r'\(\d+(?:\.\d+)?p', answer):
+                # Answer contains point distribution, keep it as is
+                pass
+            else:
+                # Try to find the complete answer with points that might be on the next line
+                extended_match = re.search(r'Final Answer:\s*(.+?\(.+?\d+(?:\.\d+)?p.*?\))', full_response, re.IGNORECASE | re.DOTALL)
+                if extended_match:
+                    answer = extended_match.group(1).strip()
+        else:
+            # Fallback: try to extract everything after "Final Answer:"
+            answer_match = re.search(r'Final Answer:\s*(.+)', full_response, re.IGNORECASE | re.DOTALL)
             if answer_match:
                 answer = answer_match.group(1).strip()
-                # Ensure we capture the full answer including points distribution in parentheses
-                # Look for patterns like (1p), (0.5p), (2p for ...), etc.
-                # Try to find a complete answer ending with a point distribution
-                if re.search(r'\(\d+(?:\.\d+)?p', answer):
-                    # Answer contains point distribution, keep it as is
-                    pass
-                else:
-                    # Try to find the complete answer with points that might be on the next line
-                    extended_match = re.search(r'Final Answer:\s*(.+?\(.+?\d+(?:\.\d+)?p.*?\))', full_response, re.IGNORECASE | re.DOTALL)
-                    if extended_match:
-                        answer = extended_match.group(1).strip()
             else:
-                # Fallback: try to extract everything after "Final Answer:"
-                answer_match = re.search(r'Final Answer:\s*(.+)', full_response, re.IGNORECASE | re.DOTALL)
-                if answer_match:
-                    answer = answer_match.group(1).strip()
-                else:
-                    # Try to extract the last line as answer
-                    lines = full_response.split('\n')
-                    answer = lines[-1].strip() if lines else full_response
-            
-            return answer, full_response
-            
+                # Try to extract the last line as answer
+                lines = full_response.split('\n')
+                answer = lines[-1].strip() if lines else full_response
+        
+        return answer
+    
+    def solve(self, problem: str, is_latex: bool = False, available_points: Optional[float] = None) -> Tuple[str, str]:
+        """
+        Solve a math problem and return answer and explanation.
+        
+        Args:
+            problem: The problem text (can be LaTeX formatted)
+            is_latex: Whether the problem contains LaTeX formatting
+            available_points: Optional points value for the question (used for point distribution)
+        
+        Returns:
+            Tuple of (answer, explanation)
+        """
+        messages = self._messages(problem, is_latex, available_points)
+        try:
+            full_response = self._call_api_with_retry(messages, temperature=0.3)
+            return self._extract_answer(full_response), full_response
+        except Exception as e:
+            logger.error(f"Error in {self.name}: {e}")
+            return "ERROR", f"Error occurred: {str(e)}"
+    
+    async def asolve(self, problem: str, is_latex: bool = False, available_points: Optional[float] = None, *, client: AsyncOpenAI) -> Tuple[str, str]:
+        """Async counterpart of `solve` on a shared AsyncOpenAI client."""
+        messages = self._messages(problem, is_latex, available_points)
+        try:
+            full_response = await self._acall_api_with_retry(client, messages, temperature=0.3)
+            return self._extract_answer(full_response), full_response
         except Exception as e:
             logger.error(f"Error in {self.name}: {e}")
             return "ERROR", f"Error occurred: {str(e)}"
@@ -185,7 +276,7 @@ Problem:
 class Arbiter:
     """Arbiter LLM that evaluates solver agreement and correctness."""
     
-    def __init__(self, model: str, max_retries: int = 3, retry_delay: float = 1.0):
+    def __init__(self, model: str, max_retries: int = 3, retry_delay: float = 1.0, limiter: Optional[RateLimiter] = None, client: Optional[OpenAI] = None):
         """
         Initialize an Arbiter instance.
         
@@ -193,14 +284,14 @@ class Arbiter:
             model: OpenAI model name to use
             max_retries: Maximum number of retry attempts for API calls
             retry_delay: Initial delay between retries (exponential backoff)
+            limiter: Optional rate limiter shared with the other ensemble members
+            client: OpenAI client to use (defaults to the process-wide pooled client)
         """
-        api_key = os.getenv('OPENAI_API_KEY')
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY not found in environment variables")
-        self.client = OpenAI(api_key=api_key)
+        self.client = client or get_client()
         self.model = model
         self.max_retries = max_retries
         self.retry_delay = retry_delay
+        self.limiter = limiter
     
     def _call_api_with_retry(self, messages: List[Dict[str, str]], temperature: float = 0.2) -> str:
         """
@@ -216,15 +307,22 @@ class Arbiter:
         Raises:
             Exception: If all retry attempts fail
         """
+        key = _response_cache_key("Arbiter", self.model, messages, temperature)
+        cached = _cached_response(key)
+        if cached is not None:
+            return cached
+        
         last_exception = None
         for attempt in range(self.max_retries):
+            if self.limiter:
+                self.limiter.acquire_sync(estimate_tokens(messages))
             try:
                 response = self.client.chat.completions.create(
                     model=self.model,
                     messages=messages,
                     temperature=temperature
                 )
-                return response.choices[0].message.content.strip()
+                return _store_response(key, response.choices[0].message.content.strip())
             except Exception as e:
                 last_exception = e
                 if attempt < self.max_retries - 1:
@@ -236,17 +334,37 @@ class Arbiter:
         
         raise last_exception or Exception("Unknown error in API call")
     
-    def evaluate(self, problem: str, solver_results: List[Dict[str, str]]) -> Dict[str, Any]:
-        """
-        Evaluate solver results and determine agreement.
+    async def _acall_api_with_retry(self, client: AsyncOpenAI, messages: List[Dict[str, str]], temperature: float = 0.2) -> str:
+        """Async counterpart of `_call_api_with_retry` on the given client."""
+        key = _response_cache_key("Arbiter", self.model, messages, temperature)
+        cached = _cached_response(key)
+        if cached is not None:
+            return cached
         
-        Args:
-            problem: Original problem statement
-            solver_results: List of dicts with 'solver', 'answer', 'explanation'
+        last_exception = None
+        for attempt in range(self.max_retries):
+            if self.limiter:
+                await self.limiter.acquire(estimate_tokens(messages))
+            try:
+                response = await client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=temperature
+                )
+                return _store_response(key, response.choices[0].message.content.strip())
+            except Exception as e:
+                last_exception = e
+                if attempt < self.max_retries - 1:
+                    delay = self.retry_delay * (2 ** attempt)  # Exponential backoff
+                    logger.warning(f"Arbiter attempt {attempt + 1} failed: {e}. Retrying in {delay:.1f}s...")
+                    await asyncio.sleep(delay)
+                else:
+                    logger.error(f"Arbiter failed after {self.max_retries} attempts: {e}")
         
-        Returns:
-            Dict with agreement status, chosen answer, and rephrasing info
-        """
+        raise last_exception or Exception("Unknown error in API call")
+    
+    def _messages(self, problem: str, solver_results: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Build the chat messages asking whether the solver answers agree."""
         # Format solver results for the arbiter
         results_text = "\n\n".join([
             f"Solver {i+1} ({result['solver']}):\n"
@@ -294,14 +412,15 @@ Original Problem:
 Solver Results:
 {results_text}"""
         
-        messages = [
+        return [
             {"role": "system", "content": "You are an arbiter that evaluates math solutions for semantic equivalence. You understand that answers can be semantically equivalent even if worded differently. You must respond with valid JSON only, starting with { and ending with }."},
             {"role": "user", "content": prompt}
         ]
-        
+    
+    @staticmethod
+    def _parse_decision(response_text: str, solver_results: List[Dict[str, str]]) -> Dict[str, Any]:
+        """Decode the arbiter's JSON decision, falling back to the first answer if it is malformed."""
         try:
-            response_text = self._call_api_with_retry(messages, temperature=0.2)
-            
             # Extract JSON from response - handle various formats
             # Remove markdown code blocks if present
             response_text = re.sub(r'```json\s*', '', response_text)
@@ -352,15 +471,33 @@ Solver Results:
                 "needs_rephrase": False,
                 "rephrased_question": ""
             }
-        except Exception as e:
-            # Re-raise to let caller handle with direct agreement check
-            raise e
+    
+    def evaluate(self, problem: str, solver_results: List[Dict[str, str]]) -> Dict[str, Any]:
+        """
+        Evaluate solver results and determine agreement.
+        
+        Args:
+            problem: Original problem statement
+            solver_results: List of dicts with 'solver', 'answer', 'explanation'
+        
+        Returns:
+            Dict with agreement status, chosen answer, and rephrasing info
+        """
+        messages = self._messages(problem, solver_results)
+        response_text = self._call_api_with_retry(messages, temperature=0.2)
+        return self._parse_decision(response_text, solver_results)
+    
+    async def aevaluate(self, problem: str, solver_results: List[Dict[str, str]], *, client: AsyncOpenAI) -> Dict[str, Any]:
+        """Async counterpart of `evaluate` on a shared AsyncOpenAI client."""
+        messages = self._messages(problem, solver_results)
+        response_text = await self._acall_api_with_retry(client, messages, temperature=0.2)
+        return self._parse_decision(response_text, solver_results)
 
 
 class EnsembleCoordinator:
     """Main coordinator for the math-solver ensemble system."""
     
-    def __init__(self, max_iterations: int = 3):
+    def __init__(self, max_iterations: int = 3, max_requests_per_minute: Optional[int] = None, max_tokens_per_minute: Optional[int] = None):
         """
         Initialize the ensemble system with three solvers and one arbiter.
         
@@ -369,13 +506,21 @@ class EnsembleCoordinator:
         - Solver 2: gpt-3.5-turbo (fast, different reasoning, very cheap)
         - Solver 3: gpt-4o-mini (cost-effective alternative)
         - Arbiter: gpt-4o-mini (cost-effective evaluation)
+        
+        With `max_requests_per_minute` / `max_tokens_per_minute` every solver and arbiter call
+        first waits on a token bucket shared by all coordinators with the same limits, so
+        concurrent questions stay inside the account's quota instead of running into 429s.
         """
+        limiter = rate_limiter(max_requests_per_minute, max_tokens_per_minute)
+        # One pooled keep-alive client for all members (and all coordinators), instead of a
+        # connection pool and TLS handshakes per solver
+        client = get_client()
         self.solvers = [
-            Solver(model="gpt-4o", name="Solver-1-GPT4o"),
-            Solver(model="gpt-4o", name="Solver-2-GPT4o"),
-            Solver(model="gpt-4o", name="Solver-3-GPT4o")
+            Solver(model="gpt-4o", name="Solver-1-GPT4o", limiter=limiter, client=client),
+            Solver(model="gpt-4o", name="Solver-2-GPT4o", limiter=limiter, client=client),
+            Solver(model="gpt-4o", name="Solver-3-GPT4o", limiter=limiter, client=client)
         ]
-        self.arbiter = Arbiter(model="gpt-4o")
+        self.arbiter = Arbiter(model="gpt-4o", limiter=limiter, client=client)
         self.max_iterations = max_iterations
     
     def normalize_answer(self, answer: str) -> str:
@@ -477,6 +622,10 @@ class EnsembleCoordinator:
         """
         Main solving method that coordinates solvers and arbiter.
         
+        Runs synchronously on the coordinator's pooled client, the three solvers of each
+        iteration in worker threads, so it is safe to call from code with a running event loop.
+        Async callers should await `solve_async` instead.
+        
         Args:
             problem: The math problem to solve
             verbose: Whether to print progress information
@@ -486,171 +635,254 @@ class EnsembleCoordinator:
         Returns:
             Dict with final answer, agreement status, and iteration info
         """
-        # Auto-detect LaTeX if not specified
         if is_latex is None:
-            is_latex = bool(re.search(r'\\[a-zA-Z]+|\\\(|\\\)|\\\[|\\\]|\$', problem))
+            is_latex = self._detect_latex(problem)
         
         current_problem = problem
-        iteration = 0
         history = []
         
-        while iteration < self.max_iterations:
-            iteration += 1
-            
-            if verbose:
-                print(f"\n{'='*60}")
-                print(f"Iteration {iteration}")
-                print(f"{'='*60}")
-                print(f"Problem: {current_problem}\n")
+        for iteration in range(1, self.max_iterations + 1):
+            self._print_iteration(iteration, current_problem, verbose)
             
             # Get solutions from all three solvers in parallel
-            solver_results = []
-            if verbose:
-                print("Querying all solvers in parallel...")
+            with ThreadPoolExecutor(max_workers=len(self.solvers)) as executor:
+                futures = [
+                    executor.submit(solver.solve, current_problem, is_latex=is_latex, available_points=available_points)
+                    for solver in self.solvers
+                ]
+                outcomes = [future.exception() or future.result() for future in futures]
+            solver_results = self._solver_results(outcomes, verbose)
+            answers, arbiter_result = self._check_direct_agreement(solver_results, verbose)
             
-            def solve_with_solver(solver):
-                """Helper function to solve with a solver and return result."""
+            direct_agreement = arbiter_result is not None
+            arbiter_success = True
+            if not direct_agreement:
                 try:
-                    answer, explanation = solver.solve(current_problem, is_latex=is_latex, available_points=available_points)
-                    return {
-                        'solver': solver.name,
-                        'answer': answer,
-                        'explanation': explanation,
-                        'success': True
-                    }
+                    arbiter_result = self._report_arbiter(self.arbiter.evaluate(current_problem, solver_results), verbose)
                 except Exception as e:
-                    logger.error(f"Error in {solver.name}: {e}")
-                    return {
-                        'solver': solver.name,
-                        'answer': "ERROR",
-                        'explanation': f"Error occurred: {str(e)}",
-                        'success': False
-                    }
-            
-            # Execute all solver calls in parallel
-            with ThreadPoolExecutor(max_workers=3) as executor:
-                future_to_solver = {
-                    executor.submit(solve_with_solver, solver): solver 
-                    for solver in self.solvers
-                }
-                
-                # Collect results as they complete
-                for future in as_completed(future_to_solver):
-                    result = future.result()
-                    solver_results.append(result)
-                    if verbose:
-                        status = "✓" if result['success'] else "✗"
-                        answer_preview = result['answer'][:80] + "..." if len(result['answer']) > 80 else result['answer']
-                        print(f"  {status} {result['solver']}: {answer_preview}")
-            
-            # Sort results to maintain consistent order (Solver 1, 2, 3)
-            solver_results.sort(key=lambda x: x['solver'])
+                    arbiter_result = self._arbiter_fallback(answers, e, verbose)
+                    arbiter_success = False
             
-            # Check for direct agreement (fast, exact/normalized match)
-            answers = [r['answer'] for r in solver_results]
-            direct_agreement = self.answers_match(answers)
+            outcome = self._conclude_iteration(
+                iteration, current_problem, solver_results, answers, arbiter_result,
+                direct_agreement, arbiter_success, history, verbose
+            )
+            if isinstance(outcome, dict):
+                return outcome
+            current_problem = outcome
+        
+        return self._max_iterations_result(history, verbose)
+    
+    async def solve_async(self, problem: str, verbose: bool = True, is_latex: Optional[bool] = None, available_points: Optional[float] = None, *, client: Optional[AsyncOpenAI] = None) -> Dict[str, Any]:
+        """
+        Async version of `solve`: the three solvers of each iteration run concurrently on one
+        AsyncOpenAI client. Without a `client`, one is opened for the duration of the call.
+        """
+        if client is None:
+            async with get_async_client() as client:
+                return await self.solve_async(problem, verbose, is_latex, available_points, client=client)
+        
+        if is_latex is None:
+            is_latex = self._detect_latex(problem)
+        
+        current_problem = problem
+        history = []
+        
+        for iteration in range(1, self.max_iterations + 1):
+            self._print_iteration(iteration, current_problem, verbose)
             
-            if verbose:
-                print(f"\nDirect Agreement Check: {direct_agreement}")
+            # Execute all solver calls concurrently
+            outcomes = await asyncio.gather(
+                *(solver.asolve(current_problem, is_latex=is_latex, available_points=available_points, client=client)
+                  for solver in self.solvers),
+                return_exceptions=True
+            )
+            solver_results = self._solver_results(outcomes, verbose)
+            answers, arbiter_result = self._check_direct_agreement(solver_results, verbose)
             
-            # If we have direct agreement, skip arbiter (saves cost and time)
-            # For semantic similarity, let the arbiter LLM handle it
-            if direct_agreement:
-                arbiter_result = {
-                    "agreement": True,
-                    "chosen_answer": "",
-                    "needs_rephrase": False,
-                    "rephrased_question": ""
-                }
-                arbiter_success = True
-                
-                # Use the most common answer (majority vote)
-                normalized_answers = [self.normalize_answer(a) for a in answers]
-                counts = Counter(normalized_answers)
-                most_common = counts.most_common(1)[0][0]
-                # Find the original answer that matches the most common normalized version
-                for answer in answers:
-                    if self.normalize_answer(answer) == most_common:
-                        arbiter_result['chosen_answer'] = answer
-                        break
-                else:
-                    arbiter_result['chosen_answer'] = answers[0]
-                
-                if verbose:
-                    print(f"\n✓ Direct agreement detected - skipping arbiter")
-                    print(f"  Chosen Answer: {arbiter_result['chosen_answer']}")
-            else:
-                # No direct agreement - let arbiter LLM evaluate semantic similarity
-                if verbose:
-                    print("\nConsulting Arbiter (evaluating semantic similarity)...")
-                
+            direct_agreement = arbiter_result is not None
+            arbiter_success = True
+            if not direct_agreement:
                 try:
-                    arbiter_result = self.arbiter.evaluate(current_problem, solver_results)
-                    arbiter_success = True
-                    
-                    if verbose:
-                        print(f"Arbiter Decision:")
-                        print(f"  Agreement: {arbiter_result['agreement']}")
-                        print(f"  Chosen Answer: {arbiter_result['chosen_answer']}")
-                        print(f"  Needs Rephrase: {arbiter_result['needs_rephrase']}")
+                    arbiter_result = self._report_arbiter(await self.arbiter.aevaluate(current_problem, solver_results, client=client), verbose)
                 except Exception as e:
-                    if verbose:
-                        print(f"Arbiter evaluation failed: {e}")
+                    arbiter_result = self._arbiter_fallback(answers, e, verbose)
                     arbiter_success = False
-                    # Use first answer as fallback
-                    arbiter_result = {
-                        "agreement": False,
-                        "chosen_answer": answers[0] if answers else "",
-                        "needs_rephrase": False,
-                        "rephrased_question": ""
-                    }
-                    if verbose:
-                        print(f"  Using fallback answer: {arbiter_result['chosen_answer']}")
-            
-            # Store iteration history
-            history.append({
-                'iteration': iteration,
-                'problem': current_problem,
-                'solver_results': solver_results,
-                'arbiter_result': arbiter_result,
-                'direct_agreement': direct_agreement,
-                'arbiter_success': arbiter_success
-            })
-            
-            # If agreement achieved, return result
-            if arbiter_result['agreement']:
-                if verbose:
-                    print(f"\n✓ Agreement achieved after {iteration} iteration(s)!")
-                
-                return {
-                    'final_answer': arbiter_result['chosen_answer'],
-                    'agreement': True,
-                    'iterations': iteration,
-                    'history': history,
-                    'solver_answers': answers
-                }
-            
-            # If rephrasing is needed and provided
-            if arbiter_result['needs_rephrase'] and arbiter_result['rephrased_question']:
-                if verbose:
-                    print(f"\nRephrasing question...")
-                    print(f"New question: {arbiter_result['rephrased_question']}")
-                
-                current_problem = arbiter_result['rephrased_question']
-                continue
             
-            # No agreement and no rephrasing - return best answer
+            outcome = self._conclude_iteration(
+                iteration, current_problem, solver_results, answers, arbiter_result,
+                direct_agreement, arbiter_success, history, verbose
+            )
+            if isinstance(outcome, dict):
+                return outcome
+            current_problem = outcome
+        
+        return self._max_iterations_result(history, verbose)
+    
+    @staticmethod
+    def _detect_latex(problem: str) -> bool:
+        return bool(re.search(r'\\[a-zA-Z]+|\\\(|\\\)|\\\[|\\\]|\$', problem))
+    
+    @staticmethod
+    def _print_iteration(iteration: int, current_problem: str, verbose: bool) -> None:
+        if verbose:
+            print(f"\n{'='*60}")
+            print(f"Iteration {iteration}")
+            print(f"{'='*60}")
+            print(f"Problem: {current_problem}\n")
+            print("Querying all solvers in parallel...")
+    
+    def _solver_results(self, outcomes: List[Any], verbose: bool) -> List[Dict[str, Any]]:
+        """
+        Turn the per-solver outcomes (an (answer, explanation) tuple or the raised exception) into
+        result dicts, sorted to maintain a consistent order (Solver 1, 2, 3).
+        """
+        solver_results = []
+        for solver, outcome in zip(self.solvers, outcomes):
+            if isinstance(outcome, BaseException):
+                if not isinstance(outcome, Exception):
+                    raise outcome
+                logger.error(f"Error in {solver.name}: {outcome}")
+                solver_results.append({
+                    'solver': solver.name,
+                    'answer': "ERROR",
+                    'explanation': f"Error occurred: {str(outcome)}",
+                    'success': False
+                })
+            else:
+                answer, explanation = outcome
+                solver_results.append({
+                    'solver': solver.name,
+                    'answer': answer,
+                    'explanation': explanation,
+                    'success': True
+                })
+        if verbose:
+            for result in solver_results:
+                status = "✓" if result['success'] else "✗"
+                answer_preview = result['answer'][:80] + "..." if len(result['answer']) > 80 else result['answer']
+                print(f"  {status} {result['solver']}: {answer_preview}")
+        solver_results.sort(key=lambda x: x['solver'])
+        return solver_results
+    
+    def _check_direct_agreement(self, solver_results: List[Dict[str, Any]], verbose: bool) -> Tuple[List[str], Optional[Dict[str, Any]]]:
+        """
+        Check for direct agreement (fast, exact/normalized match). Returns the answers and, on
+        agreement, the majority answer as arbiter result; None means the arbiter has to decide.
+        """
+        answers = [r['answer'] for r in solver_results]
+        direct_agreement = self.answers_match(answers)
+        
+        if verbose:
+            print(f"\nDirect Agreement Check: {direct_agreement}")
+        
+        # If we have direct agreement, skip arbiter (saves cost and time)
+        # For semantic similarity, let the arbiter LLM handle it
+        if not direct_agreement:
             if verbose:
-                print(f"\nNo agreement after {iteration} iteration(s). Returning best answer.")
+                print("\nConsulting Arbiter (evaluating semantic similarity)...")
+            return answers, None
+        
+        arbiter_result = {
+            "agreement": True,
+            "chosen_answer": "",
+            "needs_rephrase": False,
+            "rephrased_question": ""
+        }
+        
+        # Use the most common answer (majority vote)
+        normalized_answers = [self.normalize_answer(a) for a in answers]
+        counts = Counter(normalized_answers)
+        most_common = counts.most_common(1)[0][0]
+        # Find the original answer that matches the most common normalized version
+        for answer in answers:
+            if self.normalize_answer(answer) == most_common:
+                arbiter_result['chosen_answer'] = answer
+                break
+        else:
+            arbiter_result['chosen_answer'] = answers[0]
+        
+        if verbose:
+            print(f"\n✓ Direct agreement detected - skipping arbiter")
+            print(f"  Chosen Answer: {arbiter_result['chosen_answer']}")
+        return answers, arbiter_result
+    
+    @staticmethod
+    def _report_arbiter(arbiter_result: Dict[str, Any], verbose: bool) -> Dict[str, Any]:
+        if verbose:
+            print(f"Arbiter Decision:")
+            print(f"  Agreement: {arbiter_result['agreement']}")
+            print(f"  Chosen Answer: {arbiter_result['chosen_answer']}")
+            print(f"  Needs Rephrase: {arbiter_result['needs_rephrase']}")
+        return arbiter_result
+    
+    @staticmethod
+    def _arbiter_fallback(answers: List[str], error: Exception, verbose: bool) -> Dict[str, Any]:
+        if verbose:
+            print(f"Arbiter evaluation failed: {error}")
+        # Use first answer as fallback
+        arbiter_result = {
+            "agreement": False,
+            "chosen_answer": answers[0] if answers else "",
+            "needs_rephrase": False,
+            "rephrased_question": ""
+        }
+        if verbose:
+            print(f"  Using fallback answer: {arbiter_result['chosen_answer']}")
+        return arbiter_result
+    
+    @staticmethod
+    def _conclude_iteration(iteration: int, current_problem: str, solver_results: List[Dict[str, Any]], answers: List[str],
+                            arbiter_result: Dict[str, Any], direct_agreement: bool, arbiter_success: bool,
+                            history: List[Dict[str, Any]], verbose: bool) -> Union[Dict[str, Any], str]:
+        """
+        Record the iteration in `history` and decide how to go on: returns the final result dict,
+        or the rephrased problem for the next iteration.
+        """
+        # Store iteration history
+        history.append({
+            'iteration': iteration,
+            'problem': current_problem,
+            'solver_results': solver_results,
+            'arbiter_result': arbiter_result,
+            'direct_agreement': direct_agreement,
+            'arbiter_success': arbiter_success
+        })
+        
+        # If agreement achieved, return result
+        if arbiter_result['agreement']:
+            if verbose:
+                print(f"\n✓ Agreement achieved after {iteration} iteration(s)!")
             
             return {
                 'final_answer': arbiter_result['chosen_answer'],
-                'agreement': False,
+                'agreement': True,
                 'iterations': iteration,
                 'history': history,
                 'solver_answers': answers
             }
         
+        # If rephrasing is needed and provided
+        if arbiter_result['needs_rephrase'] and arbiter_result['rephrased_question']:
+            if verbose:
+                print(f"\nRephrasing question...")
+                print(f"New question: {arbiter_result['rephrased_question']}")
+            
+            return arbiter_result['rephrased_question']
+        
+        # No agreement and no rephrasing - return best answer
+        if verbose:
+            print(f"\nNo agreement after {iteration} iteration(s). Returning best answer.")
+        
+        return {
+            'final_answer': arbiter_result['chosen_answer'],
+            'agreement': False,
+            'iterations': iteration,
+            'history': history,
+            'solver_answers': answers
+        }
+    
+    def _max_iterations_result(self, history: List[Dict[str, Any]], verbose: bool) -> Dict[str, Any]:
         # Max iterations reached
         if verbose:
             print(f"\nMaximum iterations ({self.max_iterations}) reached.")
@@ -662,7 +894,7 @@ class EnsembleCoordinator:
             'agreement': False,
             'iterations': self.max_iterations,
             'history': history,
-            'solver_answers': answers if 'answers' in locals() else []
+            'solver_answers': [r['answer'] for r in history[-1]['solver_results']] if history else []
         }
 
 
@@ -693,9 +925,20 @@ class UEFParser:
         if not exam_file.exists():
             raise FileNotFoundError(f"Exam file not found: {exam_path}")
         
+        raw = exam_file.read_bytes()
+        
+        # Fast path: parse and validate current-format files in a single pass
+        if validate:
+            try:
+                exam = Exam.model_validate_json(raw)
+                logger.info(f"Successfully loaded and validated exam: {exam.exam_title}")
+                return exam
+            except ValidationError:
+                pass  # Old format or invalid data, handled below
+        
         try:
-            with open(exam_file, 'r', encoding='utf-8') as f:
-                exam_data = json.load(f)
+            # orjson.JSONDecodeError subclasses json.JSONDecodeError
+            exam_data = orjson.loads(raw) if orjson is not None else json.loads(raw)
         except json.JSONDecodeError as e:
             raise ValueError(f"Invalid JSON in exam file: {e}")
         
@@ -758,18 +1001,39 @@ class UEFParser:
         
         return exam_data
     
-    def save_exam_with_answers(self, exam: Exam, output_path: str):
+    def save_exam_with_answers(self, exam: Exam, output_path: str, indent: Optional[int] = None):
         """
         Save exam data with answers filled in.
         
+        Compact output is written one problem at a time, so only a single serialized
+        problem is held in memory instead of the whole exam.
+        
         Args:
             exam: Exam Pydantic model instance (with answers filled in)
             output_path: Path to save the output JSON file
+            indent: Indentation for human-readable output (default: compact)
         """
-        # Convert Pydantic model to dict and then to JSON
-        exam_dict = exam.model_dump(mode='json', exclude_none=False)
         with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(exam_dict, f, indent=2, ensure_ascii=False)
+            if indent is not None:
+                f.write(exam.model_dump_json(indent=indent))
+                return
+            
+            # Frame the exam manually from the models' own dumps: the remaining fields of the exam
+            # and of its content first, then the problems array as the last field of both
+            header = exam.model_dump_json(exclude={'exam_content'})
+            content_header = exam.exam_content.model_dump_json(exclude={'problems'})
+            f.write(self._open_object(header) + '"exam_content":')
+            f.write(self._open_object(content_header) + '"problems":[')
+            for i, problem in enumerate(exam.exam_content.problems):
+                if i:
+                    f.write(',')
+                f.write(problem.model_dump_json())
+            f.write(']}}')
+    
+    @staticmethod
+    def _open_object(object_json: str) -> str:
+        """Strip the closing brace of a serialized object, ready to append another field."""
+        return object_json[:-1] + (',' if object_json != '{}' else '')
     
     def extract_questions(self, exam: Exam) -> List[Dict[str, Any]]:
         """
@@ -838,18 +1102,29 @@ class ExamProcessor:
         self.coordinator = coordinator
         self.parser = uef_parser
     
-    def process_exam(self, exam_path: str, output_path: Optional[str] = None, verbose: bool = True) -> Exam:
+    def process_exam(self, exam_path: str, output_path: Optional[str] = None, verbose: bool = True, concurrency: Optional[int] = None) -> Exam:
         """
         Process an entire exam file, solving all questions.
         
         Args:
             exam_path: Path to input exam JSON file
             output_path: Path to save output (if None, auto-generates from input)
-            verbose: Whether to print progress
+            verbose: Whether to print progress; the per-iteration solver trace is only printed
+                with concurrency=1, since interleaved questions would garble it
+            concurrency: Questions solved at once (defaults to EXAMINATOR_CONCURRENCY, else 8)
         
         Returns:
             Exam Pydantic model with answers filled in
         """
+        return asyncio.run(self.aprocess_exam(exam_path, output_path, verbose=verbose, concurrency=concurrency))
+    
+    async def aprocess_exam(self, exam_path: str, output_path: Optional[str] = None, verbose: bool = True, concurrency: Optional[int] = None) -> Exam:
+        """
+        Async version of `process_exam`: up to `concurrency` questions are solved at once on one
+        shared AsyncOpenAI client, and each answer is written back as soon as it is ready.
+        """
+        if concurrency is None:
+            concurrency = int(os.getenv("EXAMINATOR_CONCURRENCY", "8"))
         # Load exam
         if verbose:
             print(f"Loading exam from: {exam_path}")
@@ -881,6 +1156,9 @@ class ExamProcessor:
             print(f"Time limit: {exam.total_time_min} minutes")
             print(f"Exam: {exam.exam_title}")
             print(f"Module: {exam.module}\n")
+            if concurrency > 1:
+                print(f"Solving {concurrency} questions at once; set concurrency=1 "
+                      "(EXAMINATOR_CONCURRENCY=1) for the per-iteration solver trace\n")
         
         # Process each question
         results_summary = {
@@ -890,59 +1168,78 @@ class ExamProcessor:
             'question_results': []
         }
         
-        for q_idx, question_info in enumerate(questions, 1):
-            if verbose:
-                print(f"\n{'#'*60}")
-                print(f"Processing Question {q_idx}/{len(questions)}")
-                print(f"Problem {question_info['problem_index'] + 1}, "
-                      f"Sub-question {question_info['sub_question_index'] + 1}")
-                if question_info.get('problem_title'):
-                    print(f"Title: {question_info['problem_title']}")
-                print(f"Points: {question_info['available_points']}")
-                print(f"{'#'*60}")
-            
-            question_text = question_info['question_text_latex']
-            available_points = question_info.get('available_points')
-            
-            # Solve using ensemble (UEF questions are in LaTeX format)
-            result = self.coordinator.solve(question_text, verbose=verbose, is_latex=True, available_points=available_points)
-            
-            # Store answer in exam model
-            prob_idx = question_info['problem_index']
-            sq_idx = question_info['sub_question_index']
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def solve_question(q_idx: int, question_info: Dict[str, Any]):
+            async with semaphore:
+                # Solve using ensemble (UEF questions are in LaTeX format); the per-iteration
+                # trace is only readable when questions are not interleaved
+                result = await self.coordinator.solve_async(
+                    question_info['question_text_latex'],
+                    verbose=verbose and concurrency == 1,
+                    is_latex=True,
+                    available_points=question_info.get('available_points'),
+                    client=client,
+                )
+            return q_idx, question_info, result
+        
+        async with get_async_client() as client:
+            tasks = [solve_question(q_idx, question_info) for q_idx, question_info in enumerate(questions, 1)]
             
-            # Update the answer in the exam structure
-            problem = exam.exam_content.problems[prob_idx]
-            if isinstance(problem, ExamQuestion):
-                # Update the answer for regular exam questions
-                problem.sub_questions[sq_idx].question_answer_latex = result['final_answer']
+            # Answers are written back by (problem, sub-question) index, so completion order does not matter
+            for next_done in asyncio.as_completed(tasks):
+                q_idx, question_info, result = await next_done
+                if verbose:
+                    print(f"\n{'#'*60}")
+                    print(f"Solved Question {q_idx}/{len(questions)}")
+                    print(f"Problem {question_info['problem_index'] + 1}, "
+                          f"Sub-question {question_info['sub_question_index'] + 1}")
+                    if question_info.get('problem_title'):
+                        print(f"Title: {question_info['problem_title']}")
+                    print(f"Points: {question_info['available_points']}")
+                    print(f"Answer: {result['final_answer']}")
+                    print(f"{'#'*60}")
                 
-                # Store metadata in a dict format (Pydantic models don't support arbitrary fields)
-                # We'll store it as a JSON string in a comment or separate metadata file
-                # For now, we'll add it to the model dict after conversion
-                # Note: This requires converting to dict, adding metadata, then back to model
-                # For simplicity, we'll store metadata separately or in a custom field
-            elif isinstance(problem, MultipleChoiceExamQuestion):
-                # This shouldn't happen as extract_questions() skips MC questions
-                logger.warning(f"Attempted to process MultipleChoiceExamQuestion at index {prob_idx} - skipping")
-                continue
-            else:
-                logger.error(f"Unknown problem type at index {prob_idx}: {type(problem)}")
-                continue
-            
-            # Update summary
-            if result['agreement']:
-                results_summary['agreed_answers'] += 1
-            else:
-                results_summary['disagreed_answers'] += 1
-            
-            results_summary['question_results'].append({
-                'question_index': q_idx,
-                'problem_index': prob_idx,
-                'sub_question_index': sq_idx,
-                'agreement': result['agreement'],
-                'iterations': result['iterations']
-            })
+                # Store answer in exam model
+                prob_idx = question_info['problem_index']
+                sq_idx = question_info['sub_question_index']
+                
+                # Update the answer in the exam structure
+                problem = exam.exam_content.problems[prob_idx]
+                if isinstance(problem, ExamQuestion):
+                    # Update the answer for regular exam questions
+                    problem.sub_questions[sq_idx] = problem.sub_questions[sq_idx].model_copy(
+                        update={"question_answer_latex": result['final_answer']}
+                    )
+                
+                    # Store metadata in a dict format (Pydantic models don't support arbitrary fields)
+                    # We'll store it as a JSON string in a comment or separate metadata file
+                    # For now, we'll add it to the model dict after conversion
+                    # Note: This requires converting to dict, adding metadata, then back to model
+                    # For simplicity, we'll store metadata separately or in a custom field
+                elif isinstance(problem, MultipleChoiceExamQuestion):
+                    # This shouldn't happen as extract_questions() skips MC questions
+                    logger.warning(f"Attempted to process MultipleChoiceExamQuestion at index {prob_idx} - skipping")
+                    continue
+                else:
+                    logger.error(f"Unknown problem type at index {prob_idx}: {type(problem)}")
+                    continue
+                
+                # Update summary
+                if result['agreement']:
+                    results_summary['agreed_answers'] += 1
+                else:
+                    results_summary['disagreed_answers'] += 1
+                
+                results_summary['question_results'].append({
+                    'question_index': q_idx,
+                    'problem_index': prob_idx,
+                    'sub_question_index': sq_idx,
+                    'agreement': result['agreement'],
+                    'iterations': result['iterations']
+                })
+        
+        results_summary['question_results'].sort(key=lambda r: r['question_index'])
         
         # Save output
         if output_path is None:
@@ -953,7 +1250,7 @@ class ExamProcessor:
             print(f"\n{'='*60}")
             print("Saving results...")
         
-        self.parser.save_exam_with_answers(exam, output_path)
+        self.parser.save_exam_with_answers(exam, output_path, indent=2)
         
         if verbose:
             print(f"Saved to: {output_path}")
@@ -0,0 +1,386 @@
+import asyncio
+import atexit
+import functools
+import hashlib
+import importlib.util
+import json
+import logging
+import math
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import httpx
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    AsyncOpenAI,
+    DefaultAsyncHttpxClient,
+    DefaultHttpxClient,
+    InternalServerError,
+    OpenAI,
+    RateLimitError,
+)
+
+try:
+    from openai import DefaultAioHttpClient
+except ImportError:  # SDK releases without the aiohttp transport
+    DefaultAioHttpClient = None
+
+try:
+    import orjson
+except ImportError:  # optional speed-up, stdlib json is used without it
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# KEY=value lines, optionally prefixed with `export`; quoted values are captured without quotes.
+_ENV_LINE_RE = re.compile(
+    r"""^[ \t]*(?:export[ \t]+)?([A-Za-z_][A-Za-z0-9_]*)[ \t]*=[ \t]*"""
+    r"""(?:"([^"\n]*)"|'([^'\n]*)'|(.*?))[ \t]*$""",
+    re.MULTILINE,
+)
+
+# One pooled transport per client so concurrent requests reuse keep-alive connections; every
+# connection of a burst is kept idle for a while so the next batch skips the TCP/TLS handshake.
+HTTP_LIMITS = httpx.Limits(
+    max_connections=100, max_keepalive_connections=100, keepalive_expiry=30.0
+)
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+# HTTP/2 multiplexing needs the optional `h2` package.
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Rough completion budget per request, used to reserve tokens-per-minute capacity.
+EXPECTED_OUTPUT_TOKENS = 512
+
+MAX_ATTEMPTS = 5
+RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+# On-disk response cache shared by the rewrite and solver paths; entries expire after a day.
+CACHE_DIR = Path(os.environ.get("EXAMINATOR_CACHE_DIR", ".examinator_cache"))
+CACHE_TTL_SECONDS = 24 * 60 * 60
+
+SEMANTIC_CACHE_EMBEDDING_MODEL = "text-embedding-3-small"
+
+
+def _load_env_files(paths: tuple[Path, ...]) -> None:
+    """Minimal .env loader to avoid extra dependencies; variables already set are kept."""
+    for path in paths:
+        if not path.exists():
+            continue
+        env = {
+            key: double or single or bare
+            for key, double, single, bare in _ENV_LINE_RE.findall(path.read_text())
+        }
+        os.environ.update({key: value for key, value in env.items() if key not in os.environ})
+
+
+@functools.lru_cache(maxsize=1)
+def _ensure_env_loaded() -> None:
+    """Read ./.env and ../.env once per process, unless the key is already in the environment."""
+    if "OPENAI_API_KEY" in os.environ:
+        return
+    cwd = Path.cwd().resolve()
+    _load_env_files((cwd / ".env", cwd.parent / ".env"))
+
+
+def api_key(key: Optional[str] = None) -> str:
+    """Return `key` or OPENAI_API_KEY, loading it from a local .env file if necessary."""
+    if key:
+        return key
+    _ensure_env_loaded()
+
+    key = os.environ.get("OPENAI_API_KEY")
+    if not key:
+        raise RuntimeError(
+            "Set OPENAI_API_KEY (e.g., in a local .env file that is gitignored)."
+        )
+    return key
+
+
+@functools.lru_cache(maxsize=None)
+def get_client(key: Optional[str] = None) -> OpenAI:
+    """
+    Return one shared client per API key (the OpenAI client is thread-safe). It lives for the
+    whole process and its pooled connections are closed at exit.
+    """
+    http_client = DefaultHttpxClient(
+        limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT, http2=HTTP2_AVAILABLE
+    )
+    client = OpenAI(api_key=api_key(key), http_client=http_client)
+    atexit.register(client.close)
+    return client
+
+
+def _async_http_client():
+    """
+    Prefer the SDK's aiohttp transport, whose latency stays flat under many concurrent requests
+    where httpx's async pool degrades; fall back to httpx without the `openai[aiohttp]` extra.
+    """
+    if DefaultAioHttpClient is not None:
+        try:
+            return DefaultAioHttpClient(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+        except RuntimeError:  # aiohttp extra not installed
+            pass
+    return DefaultAsyncHttpxClient(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT, http2=HTTP2_AVAILABLE)
+
+
+def get_async_client(key: Optional[str] = None) -> AsyncOpenAI:
+    """
+    Return a new async client. Async clients are bound to the event loop they first run on,
+    so they are not shared across `asyncio.run` calls.
+    """
+    return AsyncOpenAI(api_key=api_key(key), http_client=_async_http_client())
+
+
+class RateLimiter:
+    """
+    Token bucket over requests and tokens per minute, shared by concurrent OpenAI calls.
+    Capacity is reserved under a lock and waited for outside of it, so one instance works
+    across threads and across event loops.
+    """
+
+    def __init__(
+        self,
+        max_requests_per_minute: Optional[int] = None,
+        max_tokens_per_minute: Optional[int] = None,
+    ):
+        self.max_requests_per_minute = max_requests_per_minute
+        self.max_tokens_per_minute = max_tokens_per_minute
+        self._available_requests = float(max_requests_per_minute or 0)
+        self._available_tokens = float(max_tokens_per_minute or 0)
+        self._last_update = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: int) -> float:
+        """Take capacity for one request and return how long to wait until it is available."""
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._last_update
+            self._last_update = now
+
+            wait = 0.0
+            if self.max_requests_per_minute:
+                rate = self.max_requests_per_minute / 60.0
+                self._available_requests = min(
+                    float(self.max_requests_per_minute), self._available_requests + elapsed * rate
+                ) - 1
+                if self._available_requests < 0:
+                    wait = max(wait, -self._available_requests / rate)
+            if self.max_tokens_per_minute:
+                rate = self.max_tokens_per_minute / 60.0
+                self._available_tokens = min(
+                    float(self.max_tokens_per_minute), self._available_tokens + elapsed * rate
+                ) - tokens
+                if self._available_tokens < 0:
+                    wait = max(wait, -self._available_tokens / rate)
+            return wait
+
+    def acquire_sync(self, tokens: int = 0) -> None:
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire(self, tokens: int = 0) -> None:
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+@functools.lru_cache(maxsize=None)
+def rate_limiter(
+    max_requests_per_minute: Optional[int], max_tokens_per_minute: Optional[int]
+) -> Optional[RateLimiter]:
+    """Return the limiter shared by all calls configured with the same limits."""
+    if not max_requests_per_minute and not max_tokens_per_minute:
+        return None
+    return RateLimiter(max_requests_per_minute, max_tokens_per_minute)
+
+
+def estimate_tokens(messages: list[dict]) -> int:
+    return sum(len(m["content"]) for m in messages) // 4 + EXPECTED_OUTPUT_TOKENS
+
+
+def dumps(obj, *, sort_keys: bool = False) -> str:
+    """Compact JSON encoding, via orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else 0).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, sort_keys=sort_keys, separators=(",", ":"))
+
+
+def loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def cache_key(model: str, temperature: float, seed: Optional[int], messages: list[dict]) -> str:
+    raw = dumps(
+        {"model": model, "temperature": temperature, "seed": seed, "messages": messages},
+        sort_keys=True,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def cache_get(key: str) -> Optional[dict]:
+    path = CACHE_DIR / f"{key}.json"
+    try:
+        if time.time() - path.stat().st_mtime > CACHE_TTL_SECONDS:
+            return None
+        return loads(path.read_bytes())
+    except (OSError, ValueError):
+        return None
+
+
+def cache_put(key: str, value: dict) -> None:
+    tmp_path = None
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # A temp file per writer, so concurrent puts of the same key never share a half-written file
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=CACHE_DIR, prefix=f"{key}.", suffix=".tmp", delete=False
+        ) as tmp:
+            tmp_path = Path(tmp.name)
+            tmp.write(dumps(value))
+        os.replace(tmp_path, CACHE_DIR / f"{key}.json")
+    except OSError as e:
+        if tmp_path is not None:
+            tmp_path.unlink(missing_ok=True)
+        logger.warning(f"Could not write response cache entry: {e}")
+
+
+def _retry_delay(attempt: int, error: Exception) -> float:
+    """Exponential backoff with jitter, honouring a Retry-After header when the API sends one."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        if retry_after:
+            return min(60.0, float(retry_after))
+    except ValueError:
+        pass
+    return random.uniform(1.0, min(60.0, 2.0 ** (attempt + 1)))
+
+
+def call_with_retry(create, *, limiter: Optional[RateLimiter] = None, **request):
+    """Call `create(**request)`, retrying rate limits, timeouts and transient server errors."""
+    for attempt in range(MAX_ATTEMPTS):
+        if limiter:
+            limiter.acquire_sync(estimate_tokens(request["messages"]))
+        try:
+            return create(**request)
+        except RETRYABLE_ERRORS as e:
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+            delay = _retry_delay(attempt, e)
+            logger.warning(f"OpenAI call failed ({e}), retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+
+async def acall_with_retry(create, *, limiter: Optional[RateLimiter] = None, **request):
+    """Async counterpart of `call_with_retry`."""
+    for attempt in range(MAX_ATTEMPTS):
+        if limiter:
+            await limiter.acquire(estimate_tokens(request["messages"]))
+        try:
+            return await create(**request)
+        except RETRYABLE_ERRORS as e:
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+            delay = _retry_delay(attempt, e)
+            logger.warning(f"OpenAI call failed ({e}), retrying in {delay:.1f}s...")
+            await asyncio.sleep(delay)
+
+
+class _JsonObjectTracker:
+    """Follows string and nesting state across streamed chunks to find the end of a JSON object."""
+
+    def __init__(self):
+        self.started = False
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, text: str) -> bool:
+        """Consume the next chunk; return True once the top-level object has been closed."""
+        for ch in text:
+            if not self.started:
+                if ch.isspace():
+                    continue
+                if ch != "{":
+                    raise RuntimeError(f"Model returned non-JSON output: {text[:80]!r}")
+                self.started = True
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                self.depth += 1
+            elif ch in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    return True
+        return False
+
+
+async def astream_json(create, *, limiter: Optional[RateLimiter] = None, **request) -> dict:
+    """
+    Stream a JSON-mode completion and decode it as soon as the top-level object is complete.
+    Output that does not start with an object is rejected on its first chunk.
+    """
+    stream = await acall_with_retry(create, limiter=limiter, stream=True, **request)
+    tracker = _JsonObjectTracker()
+    parts: list[str] = []
+    try:
+        async for chunk in stream:
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            delta = chunk.choices[0].delta.content
+            parts.append(delta)
+            if tracker.feed(delta):
+                obj, _ = json.JSONDecoder().raw_decode("".join(parts).lstrip())
+                return obj
+    finally:
+        await stream.close()
+    raise RuntimeError("Model response ended before a complete JSON object was received.")
+
+
+class SemanticCache:
+    """
+    In-memory nearest-neighbour cache of generated results keyed by prompt embeddings.
+    Embeddings are stored normalised, so cosine similarity is a plain dot product.
+    """
+
+    def __init__(self):
+        self._entries: list[tuple[list[float], dict]] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalise(embedding: list[float]) -> list[float]:
+        norm = math.sqrt(sum(x * x for x in embedding)) or 1.0
+        return [x / norm for x in embedding]
+
+    def lookup(self, embedding: list[float], threshold: float) -> Optional[dict]:
+        """Return the stored result most similar to `embedding` if it reaches `threshold`."""
+        query = self._normalise(embedding)
+        with self._lock:
+            entries = list(self._entries)
+
+        best_score, best_update = threshold, None
+        for stored, update in entries:
+            score = sum(a * b for a, b in zip(query, stored))
+            if score >= best_score:
+                best_score, best_update = score, update
+        return best_update
+
+    def add(self, embedding: list[float], update: dict) -> None:
+        entry = (self._normalise(embedding), update)
+        with self._lock:
+            self._entries.append(entry)
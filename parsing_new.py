@@ -1,12 +1,15 @@
 import os
 import sys
 import base64
+import logging
 import fitz  # PyMuPDF
 from dotenv import load_dotenv
 from openai import OpenAI
 from data_model import ExamContent, ExamMetadataOnly, Exam
 import streamlit as st
 
+logger = logging.getLogger(__name__)
+
 load_dotenv()
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
@@ -16,7 +19,7 @@ def encode_page(page):
 
 #Metadata
 def parse_metadata(doc):
-    print("[Step 1] Analysiere Deckblatt (Metadaten)...")
+    logger.debug("[Step 1] Analysiere Deckblatt (Metadaten)...")
     
     #nur die erste seite
     first_page_img = encode_page(doc[0])
@@ -42,7 +45,7 @@ def parse_metadata(doc):
 
 #CONTENT 
 def parse_content(doc):
-    print(f"[Step 2] Analysiere Aufgaben (Seite 2 bis {len(doc)})...")
+    logger.debug(f"[Step 2] Analysiere Aufgaben (Seite 2 bis {len(doc)})...")
     
     images = []
     # Wir starten ab Seite 2 (Index 1), da Seite 1 nur Deckblatt ist
@@ -50,7 +53,7 @@ def parse_content(doc):
         # Optional: Limit für Tests 
         # if i > 5: break 
         
-        print(f"   - Verarbeite Seite {i+1}")
+        logger.debug(f"   - Verarbeite Seite {i+1}")
         b64 = encode_page(doc[i])
         images.append({
             "type": "image_url",
@@ -85,7 +88,6 @@ def parse_content(doc):
     )
     return completion.choices[0].message.parsed
 
-@st.cache_data()
 def parse_exam_complete(uploaded_file):
     """
     Parse exam from Streamlit UploadedFile object.
@@ -93,22 +95,31 @@ def parse_exam_complete(uploaded_file):
     Args:
         uploaded_file: Streamlit UploadedFile object
     """
-    # Read bytes from uploaded file
-    pdf_bytes = uploaded_file.read()
+    # getvalue() ignores the read position, so reruns always see the whole file
+    return parse_exam_pdf(uploaded_file.getvalue())
+
+@st.cache_data(show_spinner=False)
+def parse_exam_pdf(pdf_bytes: bytes) -> Exam:
+    """
+    Parse exam from PDF bytes. Cached on the PDF content, so re-uploads and
+    reruns with the same file skip PyMuPDF and the LLM calls.
     
+    Args:
+        pdf_bytes: Raw bytes of the exam PDF
+    """
     # Open PDF from bytes
     doc = fitz.open(stream=pdf_bytes, filetype="pdf")
     # metadata 
     meta = parse_metadata(doc)
     if not meta:
         raise ValueError("Could not parse metadata from the exam.")
-    print(f"Metadaten erkannt: {meta.exam_title} ({meta.examiner})")
+    logger.debug(f"Metadaten erkannt: {meta.exam_title} ({meta.examiner})")
     
     #content
     content = parse_content(doc)
     if not content:
         raise ValueError("Could not parse content from the exam.")
-    print(f" Content erkannt: {len(content.problems)} Aufgaben")
+    logger.debug(f" Content erkannt: {len(content.problems)} Aufgaben")
     
     # zusammenfügen
     final_exam = Exam(
@@ -131,7 +142,8 @@ if __name__ == "__main__":
     output_file = pdf_file.replace(".pdf", ".json")
 
     try:
-        result = parse_exam_complete(pdf_file)
+        with open(pdf_file, "rb") as f:
+            result = parse_exam_pdf(f.read())
         
         with open(output_file, "w", encoding="utf-8") as f:
             f.write(result.model_dump_json(indent=2))
@@ -1,7 +1,9 @@
+import io
 import os
 import sys
 import logging
 from pathlib import Path
+from typing import Union
 import chromadb
 from chromadb.config import Settings as ChromaSettings
 from openai import OpenAI
@@ -56,8 +58,10 @@ def get_embedding(text: str) -> list:
     )
     return response.data[0].embedding
 
-@st.cache_resource()
-def ingest_script_for_rag(script_path: str) -> chromadb.Collection:
+# No spinner: app.py runs the ingestion in a worker thread, which has no script context to
+# draw one in
+@st.cache_resource(show_spinner=False)
+def ingest_script_for_rag(script: Union[str, bytes]) -> chromadb.Collection:
     """
     Process a lecture script PDF and ingest it into ChromaDB.
     
@@ -68,7 +72,8 @@ def ingest_script_for_rag(script_path: str) -> chromadb.Collection:
     4. Store in ChromaDB and persist to disk
     
     Args:
-        script_path (str): Path to the PDF file
+        script (str | bytes): Path to the PDF file, or the PDF content itself
+            (e.g. an upload's bytes, which skips the round-trip through a temporary file)
         
     Returns:
         chromadb.Collection: The ChromaDB collection
@@ -79,24 +84,28 @@ def ingest_script_for_rag(script_path: str) -> chromadb.Collection:
     """
     
     # Validate input
-    script_file = Path(script_path)
-    if not script_file.exists():
-        logger.error(f"Script file not found: {script_path}")
-        raise FileNotFoundError(f"Script file not found: {script_path}")
-    
-    if not script_file.suffix.lower() == ".pdf":
-        logger.warning(f"File is not a PDF: {script_path}")
+    if isinstance(script, bytes):
+        source = "uploaded script"
+    else:
+        source = script
+        script_file = Path(script)
+        if not script_file.exists():
+            logger.error(f"Script file not found: {script}")
+            raise FileNotFoundError(f"Script file not found: {script}")
+        
+        if not script_file.suffix.lower() == ".pdf":
+            logger.warning(f"File is not a PDF: {script}")
     
     # Check API key
     if not os.getenv("OPENAI_API_KEY"):
         logger.error("OPENAI_API_KEY not found in environment variables")
         raise ValueError("OPENAI_API_KEY not configured")
     
-    logger.info(f"Step 1: Loading PDF from {script_path}...")
+    logger.info(f"Step 1: Loading PDF from {source}...")
     try:
         # Extract text from PDF
         text = ""
-        with open(script_path, "rb") as f:
+        with io.BytesIO(script) if isinstance(script, bytes) else open(script, "rb") as f:
             reader = PdfReader(f)
             logger.info(f"PDF has {len(reader.pages)} pages")
             for page_num, page in enumerate(reader.pages):
@@ -144,7 +153,7 @@ def ingest_script_for_rag(script_path: str) -> chromadb.Collection:
                 ids=[f"chunk_{i}"],
                 embeddings=[embedding],
                 documents=[chunk],
-                metadatas=[{"source": script_path, "chunk_index": i}]
+                metadatas=[{"source": source, "chunk_index": i}]
             )
         
         logger.info(f"Stored all chunks in ChromaDB at {DB_DIR}")
@@ -49,5 +49,9 @@ exam = Exam(
 
 # Build the exam PDF
 print("Building exam PDF...")
-pdf_path = build_exam(exam)
-print(f"PDF successfully generated at: {pdf_path}")
+exam_pdf, solution_pdf = build_exam(exam)
+with open("exam.pdf", "wb") as f:
+    f.write(exam_pdf)
+with open("exam-solution.pdf", "wb") as f:
+    f.write(solution_pdf)
+print("PDFs successfully written to exam.pdf and exam-solution.pdf")
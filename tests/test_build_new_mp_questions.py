@@ -0,0 +1,150 @@
+import asyncio
+import json
+import unittest
+from types import SimpleNamespace
+
+import build_new_mp_questions as mp
+import llm_client
+from data_model import MultipleChoiceExamQuestion
+from test_llm_client import _rate_limit_error
+from test_question_modification import FakeBatchClient, _batch_line
+
+
+def _mc_question(title, options=("a", "b")):
+    return MultipleChoiceExamQuestion.model_validate({
+        "total_points": 1,
+        "question_title": title,
+        "sub_questions": [{
+            "question_text_latex": "x",
+            "question_options": list(options),
+            "question_correct_option_indices": [0],
+            "question_points": 1,
+        }],
+    })
+
+
+def _varied(question):
+    return question.model_copy(update={"question_title": "V:" + question.question_title})
+
+
+class FakeStream:
+    def __init__(self, text):
+        self.text = text
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for start in range(0, len(self.text), 7):
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=self.text[start:start + 7]))])
+
+    async def close(self):
+        pass
+
+
+class FakeAsyncClient:
+    """Streams back the original question from the prompt with a 'V:' title prefix."""
+
+    def __init__(self):
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **request):
+        self.requests.append(request)
+        await asyncio.sleep(0)
+        prompt = request["messages"][-1]["content"]
+        original = prompt.split("original question:\n\n")[1].split("\n\nVariation")[0]
+        question = MultipleChoiceExamQuestion.model_validate_json(original)
+        return FakeStream(_varied(question).model_dump_json())
+
+
+class ModifyMpQuestionsTest(unittest.TestCase):
+    def test_identical_questions_are_sent_once_and_results_keep_input_order(self):
+        client = FakeAsyncClient()
+        questions = [_mc_question("Q1"), _mc_question("Q2"), _mc_question("Q1"), _mc_question("Q3", options=()), _mc_question("Q1")]
+        result = asyncio.run(mp.amodify_mp_questions(questions, client=client))
+        self.assertEqual([q.question_title for q in result], ["V:Q1", "V:Q2", "V:Q1", "Q3", "V:Q1"])
+        self.assertEqual(len(client.requests), 2)
+        self.assertIs(result[0], result[2])
+
+    def test_question_key_is_content_based(self):
+        self.assertEqual(mp._question_key(_mc_question("Q1")), mp._question_key(_mc_question("Q1")))
+        self.assertNotEqual(mp._question_key(_mc_question("Q1")), mp._question_key(_mc_question("Q2")))
+        self.assertEqual(len(mp._question_key(_mc_question("Q1"))), 16)
+
+    def test_no_hedged_requests_by_default(self):
+        client = FakeAsyncClient()
+        asyncio.run(mp.agenerate_exam_question_with_openai(_mc_question("Q1"), client=client))
+        self.assertEqual([request["model"] for request in client.requests], ["gpt-5"])
+
+    def test_rate_limited_embedding_is_retried(self):
+        mp._semantic_cache.cache_clear()
+        self.addCleanup(mp._semantic_cache.cache_clear)
+        replies = [_rate_limit_error(), SimpleNamespace(data=[SimpleNamespace(embedding=[1.0, 0.0])])]
+
+        async def create_embedding(**request):
+            reply = replies.pop(0)
+            if isinstance(reply, Exception):
+                raise reply
+            return reply
+
+        client = FakeAsyncClient()
+        client.embeddings = SimpleNamespace(create=create_embedding)
+        with self.assertLogs(llm_client.logger, level="WARNING"):
+            result = asyncio.run(mp.agenerate_exam_question_with_openai(
+                _mc_question("Q1"), client=client, semantic_cache_threshold=0.9
+            ))
+        self.assertEqual(result.question_title, "V:Q1")
+        self.assertEqual(replies, [])
+
+
+class FirstCompletedTest(unittest.TestCase):
+    @staticmethod
+    def call(delay, value, fail=False):
+        async def run():
+            await asyncio.sleep(delay)
+            if fail:
+                raise ValueError(value)
+            return value
+        return run
+
+    def test_hedged_copy_wins_over_a_slow_request(self):
+        result = asyncio.run(mp._first_completed([self.call(1, "slow"), self.call(0.01, "hedge")], 0.05))
+        self.assertEqual(result, "hedge")
+
+    def test_fast_request_is_not_hedged(self):
+        result = asyncio.run(mp._first_completed([self.call(0.01, "fast"), self.call(0, "hedge")], 0.5))
+        self.assertEqual(result, "fast")
+
+    def test_failure_starts_the_next_copy_and_last_error_is_raised(self):
+        result = asyncio.run(mp._first_completed([self.call(0, "x", fail=True), self.call(0, "retry")], 0.5))
+        self.assertEqual(result, "retry")
+        with self.assertRaisesRegex(ValueError, "e2"):
+            asyncio.run(mp._first_completed([self.call(0, "e1", fail=True), self.call(0, "e2", fail=True)], 0.5))
+
+
+class MpQuestionsBatchTest(unittest.TestCase):
+    def test_submit_sends_each_distinct_question_with_options_once(self):
+        client = FakeBatchClient()
+        questions = [_mc_question("Q0"), _mc_question("Q1", options=()), _mc_question("Q0"), _mc_question("Q3")]
+        self.assertEqual(mp.submit_mp_questions_batch(questions, client=client), "batch-1")
+        self.assertEqual([line["custom_id"] for line in client.uploaded], ["0", "3"])
+
+    def test_submit_without_options_returns_none(self):
+        client = FakeBatchClient()
+        self.assertIsNone(mp.submit_mp_questions_batch([_mc_question("Q0", options=())], client=client))
+
+    def test_collect_fills_duplicates_and_keeps_invalid_results_unchanged(self):
+        questions = [_mc_question("Q0"), _mc_question("Q1"), _mc_question("Q0"), _mc_question("Q3")]
+        client = FakeBatchClient([
+            _batch_line("0", _varied(questions[0]).model_dump_json()),
+            _batch_line("1", json.dumps({"question_title": "missing fields"})),
+            _batch_line("3", status_code=429, error={"message": "rate limited"}),
+        ])
+        with self.assertLogs(mp.logger, level="WARNING"):
+            result = mp.collect_mp_questions_batch("batch-1", questions, client=client)
+        self.assertEqual([q.question_title for q in result], ["V:Q0", "Q1", "V:Q0", "Q3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,201 @@
+import asyncio
+import contextlib
+import io
+import json
+import os
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+import ensemble_solver
+from ensemble_solver import EnsembleCoordinator, ExamProcessor, UEFParser
+
+EXAMPLE_EXAM = Path(__file__).resolve().parent.parent / "example_exam.json"
+ARBITER_REPLY = '{"agreement": true, "chosen_answer": "Solver 2", "needs_rephrase": false, "rephrased_question": ""}'
+
+
+class FakeClient:
+    """Sync OpenAI stand-in: solvers get `answers` in turn, the arbiter always picks Solver 2."""
+
+    def __init__(self, answers):
+        self.answers = list(answers)
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **request):
+        with self._lock:
+            self.calls += 1
+            if "arbiter" in request["messages"][0]["content"]:
+                content = ARBITER_REPLY
+            else:
+                content = self.answers.pop(0)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class FakeAsyncClient:
+    """AsyncOpenAI stand-in: solvers get `answers` in turn, the arbiter always picks Solver 2."""
+
+    def __init__(self, answers):
+        self.answers = list(answers)
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **request):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        if "arbiter" in request["messages"][0]["content"]:
+            content = ARBITER_REPLY
+        else:
+            content = self.answers.pop(0)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def _coordinator(client=None, **kwargs):
+    with mock.patch.object(ensemble_solver, "get_client", return_value=client or object()):
+        return EnsembleCoordinator(**kwargs)
+
+
+class EnsembleCoordinatorTest(unittest.TestCase):
+    def test_direct_agreement_skips_the_arbiter(self):
+        client = FakeClient(["Final Answer: 4 (1p)"] * 3)
+        result = _coordinator(client).solve("2+2", verbose=False)
+        self.assertEqual(result["final_answer"], "4 (1p)")
+        self.assertTrue(result["agreement"])
+        self.assertEqual(client.calls, 3)
+
+    def test_disagreement_is_settled_by_the_arbiter(self):
+        client = FakeClient(["Final Answer: 4 (1p)", "Final Answer: four (1p)", "Final Answer: 5 (1p)"])
+        result = _coordinator(client).solve("2+2", verbose=False)
+        self.assertTrue(result["agreement"])
+        self.assertEqual(client.calls, 4)
+        self.assertFalse(result["history"][0]["direct_agreement"])
+
+    def test_sync_solve_works_inside_a_running_event_loop(self):
+        coordinator = _coordinator(FakeClient(["Final Answer: 4 (1p)"] * 3))
+
+        async def caller():
+            return coordinator.solve("2+2", verbose=False)
+
+        self.assertEqual(asyncio.run(caller())["final_answer"], "4 (1p)")
+
+    def test_async_solvers_of_an_iteration_run_concurrently(self):
+        client = FakeAsyncClient(["Final Answer: 4 (1p)", "Final Answer: four (1p)", "Final Answer: 5 (1p)"])
+        result = asyncio.run(_coordinator().solve_async("2+2", verbose=False, client=client))
+        self.assertTrue(result["agreement"])
+        self.assertEqual(client.calls, 4)
+        self.assertEqual(client.max_in_flight, 3)
+
+    def test_members_share_one_client(self):
+        client = object()
+        coordinator = _coordinator(client)
+        self.assertEqual({id(member.client) for member in [*coordinator.solvers, coordinator.arbiter]}, {id(client)})
+
+    def test_solve_helper_reuses_one_coordinator(self):
+        ensemble_solver._coordinator.cache_clear()
+        self.addCleanup(ensemble_solver._coordinator.cache_clear)
+        with mock.patch.object(ensemble_solver, "get_client", return_value=object()):
+            self.assertIs(ensemble_solver._coordinator(), ensemble_solver._coordinator())
+
+
+class ResponseCacheKeyTest(unittest.TestCase):
+    def test_key_includes_the_ensemble_member(self):
+        messages = [{"role": "user", "content": "2+2"}]
+        with mock.patch.object(ensemble_solver, "LLM_CACHE_ENABLED", True):
+            first = ensemble_solver._response_cache_key("Solver-1", "gpt-4o", messages, 0.3)
+            second = ensemble_solver._response_cache_key("Solver-2", "gpt-4o", messages, 0.3)
+        self.assertNotEqual(first, second)
+        self.assertIsNone(ensemble_solver._response_cache_key("Solver-1", "gpt-4o", messages, 0.3))
+
+
+class FakeCoordinator:
+    """Answers with the question text; later questions finish first."""
+
+    def __init__(self):
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.verbose = set()
+
+    async def solve_async(self, problem, verbose=True, is_latex=None, available_points=None, *, client):
+        self.verbose.add(verbose)
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.05 / self.calls)
+        self.in_flight -= 1
+        return {"final_answer": "ANSWER " + problem, "agreement": True, "iterations": 1}
+
+
+class ExamProcessorTest(unittest.TestCase):
+    def test_answers_are_written_back_by_index(self):
+        coordinator = FakeCoordinator()
+        processor = ExamProcessor(coordinator, UEFParser())
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(ensemble_solver, "get_async_client", lambda: contextlib.nullcontext(object())):
+            output_path = os.path.join(tmp, "solved.json")
+            exam = asyncio.run(processor.aprocess_exam(str(EXAMPLE_EXAM), output_path, verbose=False, concurrency=2))
+            with open(output_path, encoding="utf-8") as f:
+                saved = json.load(f)
+
+        self.assertEqual(coordinator.calls, sum(len(p.sub_questions) for p in exam.exam_content.problems))
+        self.assertEqual(coordinator.max_in_flight, 2)
+        for problem in exam.exam_content.problems:
+            for sub_question in problem.sub_questions:
+                self.assertEqual(sub_question.question_answer_latex, "ANSWER " + sub_question.question_text_latex)
+        self.assertEqual(saved, json.loads(exam.model_dump_json()))
+
+    def process_verbosely(self, concurrency):
+        coordinator = FakeCoordinator()
+        processor = ExamProcessor(coordinator, UEFParser())
+        with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()) as out, \
+                mock.patch.object(ensemble_solver, "get_async_client", lambda: contextlib.nullcontext(object())):
+            processor.process_exam(str(EXAMPLE_EXAM), os.path.join(tmp, "solved.json"), concurrency=concurrency)
+        return coordinator.verbose, out.getvalue()
+
+    def test_trace_is_kept_without_concurrency(self):
+        verbose, output = self.process_verbosely(concurrency=1)
+        self.assertEqual(verbose, {True})
+        self.assertNotIn("EXAMINATOR_CONCURRENCY=1", output)
+
+    def test_concurrent_run_notes_once_that_the_trace_is_off(self):
+        verbose, output = self.process_verbosely(concurrency=2)
+        self.assertEqual(verbose, {False})
+        self.assertEqual(output.count("EXAMINATOR_CONCURRENCY=1"), 1)
+
+
+class SaveExamTest(unittest.TestCase):
+    def save_and_load(self, **kwargs):
+        parser = UEFParser()
+        exam = parser.load_exam(str(EXAMPLE_EXAM))
+        with tempfile.TemporaryDirectory() as tmp:
+            output_path = os.path.join(tmp, "exam.json")
+            parser.save_exam_with_answers(exam, output_path, **kwargs)
+            with open(output_path, encoding="utf-8") as f:
+                return exam, f.read()
+
+    def test_compact_output_matches_the_model_dump(self):
+        exam, text = self.save_and_load()
+        self.assertEqual(json.loads(text), json.loads(exam.model_dump_json()))
+        self.assertNotIn("\n", text)
+
+    def test_indented_output(self):
+        exam, text = self.save_and_load(indent=2)
+        self.assertEqual(json.loads(text), json.loads(exam.model_dump_json()))
+        self.assertIn('\n  "', text)
+
+    def test_open_object_leaves_room_for_another_field(self):
+        self.assertEqual(UEFParser._open_object('{"a":1}'), '{"a":1,')
+        self.assertEqual(UEFParser._open_object("{}"), "{")
+
+
+if __name__ == "__main__":
+    unittest.main()
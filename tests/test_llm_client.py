@@ -0,0 +1,215 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+import httpx
+import openai
+
+import llm_client
+from llm_client import RateLimiter, _JsonObjectTracker, astream_json, cache_get, cache_key, cache_put, call_with_retry
+
+
+def _chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class FakeStream:
+    def __init__(self, parts):
+        self.parts = parts
+        self.closed = False
+        self.consumed = 0
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for part in self.parts:
+            self.consumed += 1
+            yield _chunk(part)
+
+    async def close(self):
+        self.closed = True
+
+
+def _rate_limit_error(retry_after="0"):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(429, headers={"retry-after": retry_after}, request=request)
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_requests_within_the_burst_do_not_wait(self):
+        limiter = RateLimiter(max_requests_per_minute=60)
+        self.assertEqual([limiter._reserve(0) for _ in range(60)], [0.0] * 60)
+
+    def test_request_over_the_budget_waits_for_refill(self):
+        limiter = RateLimiter(max_requests_per_minute=60)
+        for _ in range(60):
+            limiter._reserve(0)
+        self.assertAlmostEqual(limiter._reserve(0), 1.0, delta=0.05)
+        self.assertAlmostEqual(limiter._reserve(0), 2.0, delta=0.05)
+
+    def test_token_budget(self):
+        limiter = RateLimiter(max_tokens_per_minute=600)
+        self.assertEqual(limiter._reserve(600), 0.0)
+        # 60 tokens at 10 tokens per second
+        self.assertAlmostEqual(limiter._reserve(60), 6.0, delta=0.05)
+
+    def test_wait_is_the_longer_of_both_budgets(self):
+        limiter = RateLimiter(max_requests_per_minute=60, max_tokens_per_minute=600)
+        limiter._reserve(600)
+        self.assertAlmostEqual(limiter._reserve(10), 1.0, delta=0.05)
+
+    def test_acquire_sleeps_for_the_reserved_wait(self):
+        limiter = RateLimiter(max_requests_per_minute=1)
+        with mock.patch.object(llm_client.time, "sleep") as sleep:
+            limiter.acquire_sync()
+            sleep.assert_not_called()
+            limiter.acquire_sync()
+        self.assertAlmostEqual(sleep.call_args.args[0], 60.0, delta=0.1)
+
+    def test_async_acquire(self):
+        limiter = RateLimiter(max_requests_per_minute=600)
+        for _ in range(600):
+            limiter._reserve(0)
+        start = time.monotonic()
+        asyncio.run(limiter.acquire())
+        self.assertGreaterEqual(time.monotonic() - start, 0.08)
+
+    def test_rate_limiter_is_shared_per_configuration(self):
+        self.assertIsNone(llm_client.rate_limiter(None, None))
+        self.assertIs(llm_client.rate_limiter(123, None), llm_client.rate_limiter(123, None))
+        self.assertIsNot(llm_client.rate_limiter(123, None), llm_client.rate_limiter(124, None))
+
+
+class CallWithRetryTest(unittest.TestCase):
+    def test_rate_limited_call_is_retried_after_retry_after(self):
+        replies = [_rate_limit_error("2"), "ok"]
+
+        def create(**request):
+            reply = replies.pop(0)
+            if isinstance(reply, Exception):
+                raise reply
+            return reply
+
+        with mock.patch.object(llm_client.time, "sleep") as sleep, self.assertLogs(llm_client.logger, level="WARNING"):
+            self.assertEqual(call_with_retry(create, messages=[]), "ok")
+        sleep.assert_called_once_with(2.0)
+
+    def test_last_error_is_raised_after_max_attempts(self):
+        def create(**request):
+            raise _rate_limit_error()
+
+        with mock.patch.object(llm_client.time, "sleep"), self.assertLogs(llm_client.logger, level="WARNING"):
+            with self.assertRaises(openai.RateLimitError):
+                call_with_retry(create, messages=[])
+
+
+class JsonObjectTrackerTest(unittest.TestCase):
+    def feed(self, *parts):
+        tracker = _JsonObjectTracker()
+        return [tracker.feed(part) for part in parts]
+
+    def test_closes_on_the_matching_brace(self):
+        self.assertEqual(self.feed('{"a": {"b": [1, {}]}', "}"), [False, True])
+
+    def test_braces_inside_strings_are_ignored(self):
+        self.assertEqual(self.feed('{"a": "}{][', '}"', "}"), [False, False, True])
+
+    def test_escaped_quotes_do_not_end_the_string(self):
+        self.assertEqual(self.feed(r'{"a": "say \"}\" ', '"}'), [False, True])
+
+    def test_escape_split_across_chunks(self):
+        self.assertEqual(self.feed('{"a": "x\\', '"}', '"}'), [False, False, True])
+
+    def test_escaped_backslash_before_quote(self):
+        self.assertEqual(self.feed('{"a": "x\\\\"', "}"), [False, True])
+
+    def test_leading_whitespace_is_allowed(self):
+        self.assertEqual(self.feed("\n  ", "{}"), [False, True])
+
+    def test_non_json_output_is_rejected(self):
+        with self.assertRaises(RuntimeError):
+            self.feed("Sorry, I can't")
+
+
+class AstreamJsonTest(unittest.TestCase):
+    @staticmethod
+    def create_for(stream):
+        async def create(**request):
+            assert request["stream"]
+            return stream
+        return create
+
+    def test_decodes_at_the_closing_brace_and_closes_the_stream(self):
+        stream = FakeStream(['{"a": "}', '", "b": [1', "]}", "trailing", "more"])
+        result = asyncio.run(astream_json(self.create_for(stream), messages=[{"role": "user", "content": "x"}]))
+        self.assertEqual(result, {"a": "}", "b": [1]})
+        self.assertEqual(stream.consumed, 3)
+        self.assertTrue(stream.closed)
+
+    def test_non_json_output_is_rejected_on_the_first_chunk(self):
+        stream = FakeStream(["Sorry, I can't", "{}"])
+        with self.assertRaises(RuntimeError):
+            asyncio.run(astream_json(self.create_for(stream), messages=[{"role": "user", "content": "x"}]))
+        self.assertEqual(stream.consumed, 1)
+        self.assertTrue(stream.closed)
+
+    def test_incomplete_object_raises(self):
+        stream = FakeStream(['{"a": 1'])
+        with self.assertRaises(RuntimeError):
+            asyncio.run(astream_json(self.create_for(stream), messages=[{"role": "user", "content": "x"}]))
+        self.assertTrue(stream.closed)
+
+
+class DiskCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(llm_client, "CACHE_DIR", Path(self.tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_key_ignores_dict_order_but_not_request_settings(self):
+        messages = [{"role": "user", "content": "x"}]
+        key = cache_key("gpt-4o", 0.0, None, messages)
+        self.assertEqual(key, cache_key("gpt-4o", 0.0, None, [{"content": "x", "role": "user"}]))
+        self.assertNotEqual(key, cache_key("gpt-4o", 0.0, 1, messages))
+        self.assertNotEqual(key, cache_key("gpt-4o", 0.7, None, messages))
+        self.assertNotEqual(key, cache_key("gpt-4o-mini", 0.0, None, messages))
+        self.assertNotEqual(key, cache_key("gpt-4o", 0.0, None, [{"role": "user", "content": "y"}]))
+
+    def test_round_trip(self):
+        cache_put("k", {"question_text_latex": "ä"})
+        self.assertEqual(cache_get("k"), {"question_text_latex": "ä"})
+        self.assertIsNone(cache_get("missing"))
+
+    def test_expired_entries_are_ignored(self):
+        cache_put("k", {"a": 1})
+        old = time.time() - llm_client.CACHE_TTL_SECONDS - 10
+        os.utime(Path(self.tmp.name) / "k.json", (old, old))
+        self.assertIsNone(cache_get("k"))
+
+    def test_concurrent_puts_of_one_key_leave_a_complete_entry(self):
+        values = [{"writer": i, "text": "x" * 10000} for i in range(8)]
+        threads = [threading.Thread(target=cache_put, args=("k", value)) for value in values]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertIn(cache_get("k"), values)
+        self.assertEqual([path.name for path in Path(self.tmp.name).iterdir()], ["k.json"])
+
+    def test_corrupt_entries_are_ignored(self):
+        (Path(self.tmp.name) / "k.json").write_text("{not json")
+        self.assertIsNone(cache_get("k"))
+
+
+if __name__ == "__main__":
+    unittest.main()
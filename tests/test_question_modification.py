@@ -0,0 +1,202 @@
+import asyncio
+import json
+import unittest
+import warnings
+from types import SimpleNamespace
+from unittest import mock
+
+import QuestionModification as qm
+from data_model import ExamQuestion, SubQuestion
+from test_llm_client import FakeStream
+
+
+def _exam_question(*texts, points=1):
+    return ExamQuestion(
+        total_points=len(texts),
+        sub_questions=[
+            SubQuestion(question_text_latex=text, question_answer_latex="A", available_points=points)
+            for text in texts
+        ],
+    )
+
+
+def _batch_line(custom_id, content=None, status_code=200, error=None):
+    body = {"choices": [{"message": {"content": content}}]}
+    return json.dumps({
+        "custom_id": custom_id,
+        "response": {"status_code": status_code, "body": body},
+        "error": error,
+    })
+
+
+class FakeBatchClient:
+    """Records the uploaded batch file and serves `output` as the finished batch's results."""
+
+    def __init__(self, output_lines=(), statuses=("completed",)):
+        self.uploaded = None
+        self.output = "\n".join(output_lines)
+        self.statuses = list(statuses)
+        self.files = SimpleNamespace(create=self._create_file, content=self._content)
+        self.batches = SimpleNamespace(create=self._create_batch, retrieve=self._retrieve)
+
+    def _create_file(self, file, purpose):
+        self.uploaded = [json.loads(line) for line in file[1].decode("utf-8").splitlines()]
+        return SimpleNamespace(id="file-in")
+
+    def _create_batch(self, **kwargs):
+        return SimpleNamespace(id="batch-1", status="validating", output_file_id=None)
+
+    def _retrieve(self, batch_id):
+        status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+        return SimpleNamespace(id=batch_id, status=status, output_file_id="file-out")
+
+    def _content(self, file_id):
+        return SimpleNamespace(text=self.output)
+
+
+class RewriteBatchTest(unittest.TestCase):
+    def test_submit_skips_sub_questions_that_need_no_rewrite(self):
+        client = FakeBatchClient()
+        questions = [_exam_question("Q0", "Q1"), _exam_question("", "Q2")]
+        self.assertEqual(qm.submit_rewrite_batch(questions, client=client), "batch-1")
+        self.assertEqual([line["custom_id"] for line in client.uploaded], ["0:0", "0:1", "1:1"])
+        self.assertEqual(client.uploaded[0]["body"]["model"], "gpt-4o")
+
+    def test_submit_without_work_returns_none(self):
+        client = FakeBatchClient()
+        self.assertIsNone(qm.submit_rewrite_batch([_exam_question(""), _exam_question("Q0", points=0)], client=client))
+        self.assertIsNone(client.uploaded)
+
+    def test_collect_applies_results_by_custom_id(self):
+        client = FakeBatchClient(
+            [
+                _batch_line("1:0", json.dumps({"question_text_latex": "N2", "question_answer_latex": "B2"})),
+                _batch_line("0:1", json.dumps({"question_text_latex": "N1", "question_answer_latex": "B1"})),
+            ],
+            statuses=("in_progress", "completed"),
+        )
+        questions = [_exam_question("Q0", "Q1"), _exam_question("Q2")]
+        with mock.patch.object(qm.time, "sleep") as sleep:
+            result = qm.collect_rewrite_batch("batch-1", questions, client=client)
+        sleep.assert_called_once()
+        self.assertEqual(
+            [[sq.question_text_latex for sq in eq.sub_questions] for eq in result],
+            [["Q0", "N1"], ["N2"]],
+        )
+        self.assertEqual(result[1].sub_questions[0].question_answer_latex, "B2")
+
+    def test_collect_keeps_the_original_for_failed_or_unusable_results(self):
+        client = FakeBatchClient([
+            _batch_line("0:0", status_code=500, error={"message": "boom"}),
+            _batch_line("0:1", json.dumps({"question_text_latex": "N1"})),
+            _batch_line("0:2", "not json"),
+            _batch_line("0:3", json.dumps({"question_text_latex": "N3", "question_answer_latex": "B3"})),
+        ])
+        with self.assertLogs(qm.logger, level="WARNING"):
+            result = qm.collect_rewrite_batch("batch-1", [_exam_question("Q0", "Q1", "Q2", "Q3")], client=client)
+        self.assertEqual([sq.question_text_latex for sq in result[0].sub_questions], ["Q0", "Q1", "Q2", "N3"])
+
+    def test_collect_raises_for_a_failed_batch(self):
+        client = FakeBatchClient(statuses=("expired",))
+        with self.assertRaises(RuntimeError):
+            qm.collect_rewrite_batch("batch-1", [_exam_question("Q0")], client=client)
+
+    def test_blocking_rewrite_submits_and_collects(self):
+        client = FakeBatchClient([
+            _batch_line("0:0", json.dumps({"question_text_latex": "N0", "question_answer_latex": "B0"})),
+        ])
+        result = qm.rewrite_exam_questions_batch([_exam_question("Q0")], client=client)
+        self.assertEqual(result[0].sub_questions[0].question_text_latex, "N0")
+        self.assertEqual(len(client.uploaded), 1)
+
+
+class BulkRewriteTest(unittest.TestCase):
+    @staticmethod
+    def rewrite(sub_questions, content):
+        async def create(**request):
+            return FakeStream([json.dumps(content)])
+
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        return asyncio.run(qm._rewrite_sub_questions_bulk(
+            sub_questions, model="gpt-4o", temperature=0.7, client=client, variation=5
+        ))
+
+    def test_updates_are_mapped_back_by_id(self):
+        updates = self.rewrite(_exam_question("Q0", "", "Q2").sub_questions, {"items": [
+            {"id": "2", "question_text_latex": "N2", "question_answer_latex": "B2"},
+            {"id": 0, "question_text_latex": "N0", "question_answer_latex": "B0"},
+        ]})
+        self.assertEqual(updates, [
+            {"question_text_latex": "N0", "question_answer_latex": "B0"},
+            {},
+            {"question_text_latex": "N2", "question_answer_latex": "B2"},
+        ])
+
+    def test_malformed_items_keep_the_original(self):
+        with self.assertLogs(qm.logger, level="WARNING"):
+            updates = self.rewrite(_exam_question("Q0", "Q1", "Q2", "Q3").sub_questions, {"items": [
+                {"id": "0", "question_text_latex": "N0", "question_answer_latex": "B0"},
+                {"id": 1, "question_text_latex": "N1"},
+                {"id": "two", "question_text_latex": "N2", "question_answer_latex": "B2"},
+                "N3",
+            ]})
+        self.assertEqual(updates, [{"question_text_latex": "N0", "question_answer_latex": "B0"}, {}, {}, {}])
+
+    def test_response_without_items_keeps_every_original(self):
+        with self.assertLogs(qm.logger, level="WARNING"):
+            self.assertEqual(self.rewrite(_exam_question("Q0", "Q1").sub_questions, {"result": []}), [{}, {}])
+
+
+class CachedRewriteTest(unittest.TestCase):
+    def test_identical_batches_are_rewritten_once(self):
+        qm.rewrite_exam_questions_cached.clear()
+        self.addCleanup(qm.rewrite_exam_questions_cached.clear)
+        with mock.patch.object(qm, "rewrite_exam_questions", side_effect=lambda questions, **kwargs: questions) as rewrite:
+            qm.rewrite_exam_questions_cached([_exam_question("Q0")], variation=3)
+            qm.rewrite_exam_questions_cached([_exam_question("Q0")], variation=3)
+            qm.rewrite_exam_questions_cached([_exam_question("Q1")], variation=3)
+        self.assertEqual(rewrite.call_count, 2)
+
+
+class ClientWithoutChainContextTest(unittest.TestCase):
+    def test_sync_client_is_rejected_instead_of_dropped(self):
+        client = object()
+        with self.assertRaises(TypeError):
+            qm._rewrite_exam_question(_exam_question("Q0"), client=client, chain_context=False)
+        with self.assertRaises(TypeError):
+            qm.rewrite_exam_questions([_exam_question("Q0")], client=client, chain_context=False)
+
+
+class CacheOptionsTest(unittest.TestCase):
+    def test_default_uses_the_cache_only_for_deterministic_rewrites(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            self.assertFalse(qm._cache_usable(None, 0.7, None))
+            self.assertTrue(qm._cache_usable(None, 0.0, None))
+            self.assertTrue(qm._cache_usable(None, 0.7, 42))
+            self.assertFalse(qm._cache_usable(False, 0.0, None))
+
+    def test_explicit_cache_request_for_sampled_rewrites_warns(self):
+        with self.assertWarns(UserWarning):
+            self.assertFalse(qm._cache_usable(True, 0.7, None))
+        self.assertTrue(qm._cache_usable(True, 0.7, None, allow_nondeterministic_cache=True))
+
+    def test_bulk_requests_only_without_per_item_options(self):
+        self.assertEqual(qm._default_bulk_size(None, 0.7, None, False, None), qm.DEFAULT_BULK_SIZE)
+        self.assertEqual(qm._default_bulk_size(False, 0.0, None, False, None), qm.DEFAULT_BULK_SIZE)
+        self.assertEqual(qm._default_bulk_size(None, 0.0, None, False, None), 1)
+        self.assertEqual(qm._default_bulk_size(None, 0.7, 42, False, None), 1)
+        self.assertEqual(qm._default_bulk_size(True, 0.7, None, False, None), 1)
+        self.assertEqual(qm._default_bulk_size(False, 0.7, None, False, 0.92), 1)
+
+
+class DistinctSubQuestionsTest(unittest.TestCase):
+    def test_identical_sub_questions_share_one_slot(self):
+        sub_questions = _exam_question("Q0", "Q1", "Q0").sub_questions
+        distinct, positions = qm._distinct_sub_questions(sub_questions)
+        self.assertEqual([sq.question_text_latex for sq in distinct], ["Q0", "Q1"])
+        self.assertEqual(positions, [0, 1, 0])
+
+
+if __name__ == "__main__":
+    unittest.main()